@@ -0,0 +1,195 @@
+"""
+Aggregate cubes: the counts behind both dashboards in one small file per
+var1/var2 pair, so the hexbin and ratio views can be drawn as interactive
+charts instead of downloading twenty PNGs.
+
+    python aggregate_cube.py --dataset applicants.parquet --out cubes/
+
+Each cube is a compressed NumPy archive (.npz) holding, for every filter
+variable and bin threshold, the defaulter and non-defaulter counts on a
+rectangular grid over var1 x var2. The ratio view is computed from the
+same counts on the fly.
+"""
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+
+from hexbin_engine import BINS, RATIO_MIN_COUNT, HexbinEngine
+
+CUBE_FORMAT_VERSION = 1
+DEFAULT_GRID = 30
+
+
+def cube_filename(var1, var2):
+    return f"{var1}_vs_{var2}.npz"
+
+
+class AggregateCube:
+    def __init__(self, var1, var2, filters, x_edges, y_edges, defaulters, non_defaulters):
+        self.var1 = var1
+        self.var2 = var2
+        self.filters = list(filters)
+        self.x_edges = x_edges
+        self.y_edges = y_edges
+        self.defaulters = defaulters            # [filter, bin, x, y]
+        self.non_defaulters = non_defaulters
+        self._filter_pos = {f: i for i, f in enumerate(self.filters)}
+
+    # --- SERIALIZATION ---
+
+    def to_bytes(self):
+        out = io.BytesIO()
+        np.savez_compressed(
+            out,
+            format_version=np.array(CUBE_FORMAT_VERSION),
+            variables=np.array([self.var1, self.var2]),
+            filters=np.array(self.filters),
+            x_edges=self.x_edges,
+            y_edges=self.y_edges,
+            defaulters=self.defaulters,
+            non_defaulters=self.non_defaulters,
+        )
+        return out.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(bytes(data)), allow_pickle=False) as npz:
+            if int(npz["format_version"]) != CUBE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported cube format {int(npz['format_version'])}")
+            var1, var2 = (str(v) for v in npz["variables"])
+            return cls(var1, var2, [str(f) for f in npz["filters"]], npz["x_edges"], npz["y_edges"], npz["defaulters"], npz["non_defaulters"])
+
+    # --- LOOKUPS ---
+
+    def has_filter(self, filt):
+        return filt in self._filter_pos
+
+    def records(self, filt):
+        """Long-form rows (one per non-empty cell and bin) for charting."""
+        i = self._filter_pos[filt]
+        d = self.defaulters[i]
+        n = self.non_defaulters[i]
+        b, xi, yi = np.nonzero(d + n)
+        total = d[b, xi, yi] + n[b, xi, yi]
+        return {
+            "bin": b,
+            "x0": self.x_edges[xi], "x1": self.x_edges[xi + 1],
+            "y0": self.y_edges[yi], "y1": self.y_edges[yi + 1],
+            "defaulters": d[b, xi, yi],
+            "non_defaulters": n[b, xi, yi],
+            "ratio": d[b, xi, yi] / total,
+        }
+
+
+# ==========================================
+# BUILDING (from the live engine's columns)
+# ==========================================
+
+def _edges(values, grid):
+    finite = values[np.isfinite(values)]
+    if not finite.size: return np.linspace(0, 1, grid + 1)
+    lo, hi = finite.min(), finite.max()
+    if lo == hi: hi = lo + 1
+    return np.linspace(lo, hi, grid + 1)
+
+
+def build_cube(engine, var1, var2, filters=None, grid=DEFAULT_GRID):
+    """
+    Counts for every filter and bin threshold in one pass per filter:
+    cells are counted per filter decile, then summed from the top decile
+    down, which gives the "decile >= N" counts for all ten N at once.
+    """
+    x = engine.column(var1)
+    y = engine.column(var2)
+    x_edges, y_edges = _edges(x, grid), _edges(y, grid)
+    valid = np.isfinite(x) & np.isfinite(y)
+    xi = np.clip(np.searchsorted(x_edges, x, side="right") - 1, 0, grid - 1)
+    yi = np.clip(np.searchsorted(y_edges, y, side="right") - 1, 0, grid - 1)
+    cell = xi * grid + yi
+    is_defaulter = engine.is_defaulter
+
+    filters = filters or engine.variables()
+    shape = (len(filters), len(BINS), grid, grid)
+    defaulters = np.zeros(shape, dtype=np.int32)
+    non_defaulters = np.zeros(shape, dtype=np.int32)
+    cells = grid * grid
+    for i, filt in enumerate(filters):
+        decile = engine.decile_of(filt)
+        keep = valid & (decile >= 0)
+        key = decile[keep] * cells + cell[keep]
+        for target, out in ((is_defaulter[keep], defaulters), (~is_defaulter[keep], non_defaulters)):
+            per_decile = np.bincount(key[target], minlength=len(BINS) * cells).reshape(len(BINS), grid, grid)
+            # Reverse cumulative sum: bin N = deciles N..9.
+            out[i] = np.cumsum(per_decile[::-1], axis=0)[::-1]
+    return AggregateCube(var1, var2, filters, x_edges, y_edges, defaulters, non_defaulters)
+
+
+# ==========================================
+# INTERACTIVE CHARTS (Altair)
+# ==========================================
+
+def cube_chart(cube, filt, ratio=False, x_title=None, y_title=None):
+    """
+    Altair heatmap with an in-chart "Bin Threshold" slider, tooltips and
+    zoom/pan. All ten thresholds are in the chart data, so moving the
+    slider filters in the browser without a rerun.
+    """
+    # Slow to import, and only needed once a chart is drawn.
+    import altair as alt
+    import pandas as pd
+
+    df = pd.DataFrame(cube.records(filt))
+    threshold = alt.param(name="bin_threshold", value=0, bind=alt.binding_range(min=0, max=len(BINS) - 1, step=1, name="Bin Threshold "))
+    base = alt.Chart(df).transform_filter(alt.datum.bin == threshold).encode(
+        x=alt.X("x0:Q", title=x_title or cube.var1),
+        x2="x1:Q",
+        y=alt.Y("y0:Q", title=y_title or cube.var2),
+        y2="y1:Q",
+        tooltip=[
+            alt.Tooltip("defaulters:Q", title="Loan Defaulters"),
+            alt.Tooltip("non_defaulters:Q", title="Non-Defaulters"),
+            alt.Tooltip("ratio:Q", title="Default Ratio", format=".1%"),
+        ],
+    )
+    if ratio:
+        # Like the rendered ratio charts, sparse cells are left blank.
+        chart = base.transform_filter(alt.datum.defaulters + alt.datum.non_defaulters >= RATIO_MIN_COUNT).mark_rect().encode(
+            color=alt.Color("ratio:Q", title="Default Ratio", scale=alt.Scale(range=["#2e7d32", "#c62828"]), legend=alt.Legend(format=".0%"))
+        )
+    else:
+        # Same colours as the legend above the chart: blue under red.
+        chart = alt.layer(
+            base.transform_filter(alt.datum.non_defaulters > 0).mark_rect(color="#1565c0").encode(
+                opacity=alt.Opacity("non_defaulters:Q", scale=alt.Scale(type="log", range=[0.15, 0.85]), legend=None)),
+            base.transform_filter(alt.datum.defaulters > 0).mark_rect(color="#c62828").encode(
+                opacity=alt.Opacity("defaulters:Q", scale=alt.Scale(type="log", range=[0.15, 0.85]), legend=None)),
+        )
+    return chart.add_params(threshold).properties(height=600).interactive()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build aggregate cubes for every var1/var2 pair.")
+    parser.add_argument("--dataset", required=True, help="applicant table (.parquet / .feather)")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--grid", type=int, default=DEFAULT_GRID)
+    parser.add_argument("--target", default="TARGET")
+    args = parser.parse_args(argv)
+
+    engine = HexbinEngine(args.dataset, target=args.target)
+    os.makedirs(args.out, exist_ok=True)
+    total = 0
+    for var1 in engine.variables():
+        for var2 in engine.variables():
+            data = build_cube(engine, var1, var2, grid=args.grid).to_bytes()
+            with open(os.path.join(args.out, cube_filename(var1, var2)), "wb") as f:
+                f.write(data)
+            total += len(data)
+    print(f"{len(engine.variables()) ** 2} cubes, {total / (1024 * 1024):.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
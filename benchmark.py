@@ -0,0 +1,306 @@
+"""
+Load test for the dashboards against a simulated Drive (fake_drive.py).
+
+    python benchmark.py --sessions 8 --steps 20 --latency 0.08 --bandwidth 2000000 --error-rate 0.01
+
+Runs the real app script through Streamlit's AppTest with
+DATA_PALETTE_STORAGE=fake: a synthetic chart corpus is loaded into the fake
+service, one session measures the cold start, then N sessions browse the
+two dashboards concurrently (page switches and dropdown changes picked at
+random). Reports p50/p95 latency per interaction type, Drive calls per
+interaction and peak RSS; --json writes the same numbers for CI and
+--max-p95-ms turns the run into a regression gate.
+
+The Bin Threshold slider runs in the browser (chart_viewer.py), so slider
+steps cost no rerun and are not measured here.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
+from unittest import mock
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# Position of each dashboard in main.py's st.navigation list.
+PAGES = {"hexbin": 2, "ratio": 3}
+PAGE_STATE_KEY = "_benchmark_page"
+ACTIONS = ("switch_page", "var1", "var2", "filter")
+
+
+# ==========================================
+# SYNTHETIC CORPUS
+# ==========================================
+
+def make_chart(width, height, seed):
+    """A scatter-like PNG, roughly as heavy to decode as the real charts."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    rng = np.random.default_rng(seed)
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for x, y, r, c in zip(rng.integers(0, width, 3000), rng.integers(0, height, 3000), rng.integers(2, 8, 3000), rng.integers(0, 255, 3000)):
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(int(c), 60, 255 - int(c)))
+    out = io.BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+
+def tag_png(png, text):
+    """Same pixels, different bytes: adds a tEXt chunk after IHDR so every chart has its own checksum."""
+    data = b"Comment\0" + text.encode("latin-1", "replace")
+    chunk = struct.pack(">I", len(data)) + b"tEXt" + data + struct.pack(">I", zlib.crc32(b"tEXt" + data))
+    ihdr_end = 8 + 25
+    return png[:ihdr_end] + chunk + png[ihdr_end:]
+
+
+def build_corpus(service, variables, size):
+    import config
+    from chart_index import chart_filename
+
+    hexbin_png = make_chart(*size, seed=1)
+    ratio_png = make_chart(*size, seed=2)
+    names, names2 = [], []
+    for var1 in variables:
+        for var2 in variables:
+            for filt in variables:
+                for b in range(10):
+                    name = chart_filename(var1, var2, filt, b)
+                    service.put_file(config.DRIVE_FOLDER_ID_HEXBIN, name, tag_png(hexbin_png, name))
+                    names.append(name)
+                    name = chart_filename(var1, var2, filt, b, ratio=True)
+                    service.put_file(config.DRIVE_FOLDER_ID_RATIO, name, tag_png(ratio_png, name))
+                    names2.append(name)
+    service.put_file(None, "names.txt", "\n".join(names).encode("utf-8"), file_id=config.FILE_ID_NAMES_TXT)
+    service.put_file(None, "names2.txt", "\n".join(names2).encode("utf-8"), file_id=config.FILE_ID_NAMES2_TXT)
+    return len(names) + len(names2)
+
+
+# ==========================================
+# SESSIONS
+# ==========================================
+
+class _Navigation:
+    """Stand-in for st.navigation that runs the page the benchmark picked."""
+    def __init__(self, pages, **kwargs):
+        import streamlit as st
+        self.page = pages[st.session_state.get(PAGE_STATE_KEY, PAGES["hexbin"])]
+        self.title = self.page.title
+
+    def run(self):
+        self.page._page()
+
+
+def shared_runtime():
+    """
+    AppTest swaps a mock Runtime (and the appTest config flag) in and out
+    around every run, which breaks when sessions run in parallel threads.
+    Pins one shared mock instead, like the single runtime of a real server.
+    """
+    from streamlit import config as st_config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    st_config.set_option("global.appTest", True)
+
+    stack = ExitStack()
+    stack.enter_context(mock.patch.object(Runtime, "instance", classmethod(lambda cls: runtime)))
+    stack.enter_context(mock.patch.object(Runtime, "exists", classmethod(lambda cls: True)))
+    stack.enter_context(mock.patch("streamlit.testing.v1.app_test.patch_config_options", lambda options: nullcontext()))
+    return stack
+
+
+class Session:
+    def __init__(self, rng, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.rng = rng
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.page = "hexbin"
+
+    def _run(self, fn):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+        return elapsed, len(self.at.error)
+
+    def open(self, page):
+        self.page = page
+        self.at.session_state[PAGE_STATE_KEY] = PAGES[page]
+        return self._run(self.at.run)
+
+    def step(self, action):
+        if action == "switch_page":
+            return self.open("ratio" if self.page == "hexbin" else "hexbin")
+        box = self.at.selectbox[("var1", "var2", "filter").index(action)]
+        others = [i for i in range(len(box.options)) if i != box.index]
+        if not others:
+            return self._run(self.at.run)
+        return self._run(lambda: box.select_index(self.rng.choice(others)).run())
+
+
+# ==========================================
+# REPORT
+# ==========================================
+
+def percentile(values, q):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 1) if samples else None,
+        "p95_ms": round(percentile(samples, 95) * 1000, 1) if samples else None,
+        "max_ms": round(max(samples) * 1000, 1) if samples else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboards against a simulated Drive.")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions (default: %(default)s)")
+    parser.add_argument("--steps", type=int, default=10, help="interactions per session (default: %(default)s)")
+    parser.add_argument("--variables", type=int, default=3, help="variables in the synthetic corpus (default: %(default)s)")
+    parser.add_argument("--image-size", default="800x600", help="chart size WxH (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per Drive request (default: %(default)s)")
+    parser.add_argument("--bandwidth", type=float, default=5e6, help="download bytes/second per request, 0 = unlimited (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of Drive requests failing (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per interaction (default: %(default)s)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit with 1 if the warm p95 exceeds this")
+    args = parser.parse_args(argv)
+
+    # The app reads these at import time; keep the run away from the real caches.
+    cache_dir = tempfile.mkdtemp(prefix="data-palette-bench-")
+    os.environ["DATA_PALETTE_STORAGE"] = "fake"
+    os.environ["DATA_PALETTE_CACHE_DIR"] = cache_dir
+    # Published charts too; nothing is served in the benchmark.
+    os.environ["DATA_PALETTE_STATIC_DIR"] = os.path.join(cache_dir, "static")
+
+    from fake_drive import FakeDriveService, set_default_service
+
+    service = FakeDriveService(seed=args.seed)
+    variables = [f"df1_VAR_{i}" for i in range(args.variables)]
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+    charts = build_corpus(service, variables, (width, height))
+    service.latency = args.latency
+    service.bandwidth = args.bandwidth or None
+    service.error_rate = args.error_rate
+    set_default_service(service)
+    print(f"corpus: {charts} charts of {width}x{height}, cache dir {cache_dir}")
+
+    def drive_calls():
+        with service._lock:
+            return sum(service.calls.values())
+
+    rss_start = rss_mb()
+    results = {"config": vars(args)}
+    with mock.patch("streamlit.navigation", _Navigation), shared_runtime():
+        # --- COLD START: empty caches, one session ---
+        calls_before = drive_calls()
+        cold = Session(random.Random(args.seed), args.timeout)
+        cold_elapsed, cold_errors = cold.open("hexbin")
+        results["cold_start"] = {"ms": round(cold_elapsed * 1000, 1), "drive_calls": drive_calls() - calls_before, "errors": cold_errors}
+        print(f"cold start: {cold_elapsed * 1000:.0f} ms, {results['cold_start']['drive_calls']} Drive calls")
+
+        # --- CONCURRENT SESSIONS ---
+        lock = threading.Lock()
+        samples = {action: [] for action in ("open",) + ACTIONS}
+        errors = [0]
+        failures = []
+
+        def browse(i):
+            rng = random.Random(args.seed * 1000 + i)
+            session = Session(rng, args.timeout)
+            try:
+                elapsed, shown = session.open(rng.choice(list(PAGES)))
+                with lock:
+                    samples["open"].append(elapsed)
+                    errors[0] += shown
+                for _ in range(args.steps):
+                    action = rng.choice(ACTIONS)
+                    elapsed, shown = session.step(action)
+                    with lock:
+                        samples[action].append(elapsed)
+                        errors[0] += shown
+            except Exception as e:
+                with lock:
+                    failures.append(f"session {i}: {e}")
+
+        calls_before = drive_calls()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            list(pool.map(browse, range(args.sessions)))
+        wall = time.perf_counter() - started
+        interactions = sum(len(v) for v in samples.values())
+
+    warm = [s for v in samples.values() for s in v]
+    results["interactions"] = {action: summarize(v) for action, v in samples.items()}
+    results["all"] = summarize(warm)
+    results["drive_calls"] = {"total": drive_calls() - calls_before, "per_interaction": round((drive_calls() - calls_before) / interactions, 2) if interactions else None, "by_call": dict(service.calls)}
+    results["errors_shown"] = errors[0]
+    results["session_failures"] = failures
+    results["throughput_per_s"] = round(interactions / wall, 2) if wall else None
+    results["memory_mb"] = {"rss_start": rss_start and round(rss_start, 1), "rss_end": rss_mb() and round(rss_mb(), 1), "peak_rss": round(peak_rss_mb(), 1)}
+
+    print(f"{args.sessions} sessions x {args.steps} steps: {interactions} interactions in {wall:.1f}s ({results['throughput_per_s']}/s)")
+    print(f"{'interaction':<12} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for action, row in list(results["interactions"].items()) + [("all", results["all"])]:
+        if row["count"]:
+            print(f"{action:<12} {row['count']:>5} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['max_ms']:>9}")
+    print(f"Drive calls: {results['drive_calls']['total']} ({results['drive_calls']['per_interaction']} per interaction), errors shown: {errors[0]}")
+    print(f"RSS: {results['memory_mb']['rss_start']} -> {results['memory_mb']['rss_end']} MB, peak {results['memory_mb']['peak_rss']} MB")
+    for failure in failures:
+        print(f"  ! {failure}", file=sys.stderr)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if failures:
+        return 1
+    if args.max_p95_ms is not None and results["all"]["p95_ms"] is not None and results["all"]["p95_ms"] > args.max_p95_ms:
+        print(f"p95 {results['all']['p95_ms']} ms exceeds {args.max_p95_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+
+from mirror import write_atomic
+
+# ==========================================
+# CHART INDEX
+# ==========================================
+# One precomputed lookup table per corpus (hexbin / ratio):
+#     var1 -> var2 -> filter -> bin -> {name, id, md5Checksum, modifiedTime, size}
+# built by joining the names.txt manifest with the Drive folder listing.
+# Only charts that are both listed in the manifest AND present in the
+# folder make it in, so every option offered in the UI resolves to a file.
+# The index is persisted as gzipped JSON so a restart doesn't re-parse.
+
+INDEX_FORMAT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+CHART_NAME = re.compile(
+    r"^(?P<var1>.+?)_vs_(?P<var2>.+?)__filter_(?P<filter>.+?)_bin_ge_(?P<bin>\d+)(?P<suffix>_ratio)?\.png$"
+)
+
+
+def chart_filename(var1, var2, filt, bin_val, ratio=False):
+    return f"{var1}_vs_{var2}__filter_{filt}_bin_ge_{bin_val}{'_ratio' if ratio else ''}.png"
+
+
+def parse_chart_name(filename):
+    """Returns (var1, var2, filter, bin) or None if the name isn't a chart."""
+    match = CHART_NAME.match(filename)
+    if not match: return None
+    return match["var1"], match["var2"], match["filter"], int(match["bin"])
+
+
+def fingerprint(manifest_lines, file_map):
+    """Changes whenever the manifest or any listed file changes."""
+    h = hashlib.sha256()
+    for line in manifest_lines:
+        h.update(line.encode("utf-8") + b"\n")
+    for name in sorted(file_map):
+        meta = file_map[name]
+        h.update(f"{name}\0{meta['id']}\0{meta.get('md5Checksum') or meta.get('modifiedTime')}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class ChartIndex:
+    def __init__(self, tree, fingerprint=None):
+        self.tree = tree
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.tree)
+
+    # --- BUILD ---
+
+    @classmethod
+    def build(cls, manifest_lines, file_map, source_version=None):
+        """source_version, if given, is stored as the fingerprint instead of hashing the inputs."""
+        tree = {}
+        skipped = []
+        missing = []
+        for line in manifest_lines:
+            filename = line.strip()
+            if not filename.endswith(".png"): continue
+            parsed = parse_chart_name(filename)
+            if parsed is None:
+                skipped.append(filename)
+                continue
+            meta = file_map.get(filename)
+            if meta is None:
+                missing.append(filename)
+                continue
+            var1, var2, filt, bin_val = parsed
+            tree.setdefault(var1, {}).setdefault(var2, {}).setdefault(filt, {})[bin_val] = dict(meta, name=filename)
+
+        if skipped:
+            logger.warning("Chart index: %d manifest lines could not be parsed (e.g. %r)", len(skipped), skipped[0])
+        if missing:
+            logger.warning("Chart index: %d manifest entries have no file in the folder (e.g. %r)", len(missing), missing[0])
+        return cls(tree, source_version or fingerprint(manifest_lines, file_map))
+
+    # --- LOOKUPS ---
+
+    def var1_options(self):
+        return sorted(self.tree)
+
+    def var2_options(self, var1):
+        return sorted(self.tree.get(var1, {}))
+
+    def filter_options(self, var1, var2):
+        return sorted(self.tree.get(var1, {}).get(var2, {}))
+
+    def bins(self, var1, var2, filt):
+        return sorted(self.tree.get(var1, {}).get(var2, {}).get(filt, {}))
+
+    def lookup(self, var1, var2, filt, bin_val):
+        return self.tree.get(var1, {}).get(var2, {}).get(filt, {}).get(bin_val)
+
+    def entries(self):
+        for by_var2 in self.tree.values():
+            for filters in by_var2.values():
+                for bins in filters.values():
+                    yield from bins.values()
+
+    # --- DEDUPLICATION ---
+
+    def dedup_report(self):
+        """
+        How much smaller the corpus is once byte-identical charts (same
+        md5Checksum) are downloaded and stored once. Charts without a
+        checksum are counted as unique.
+        """
+        unique = {}
+        charts = total = no_checksum = 0
+        for entry in self.entries():
+            size = entry.get("size") or 0
+            charts += 1
+            total += size
+            md5 = entry.get("md5Checksum")
+            if not md5: no_checksum += 1
+            unique.setdefault(f"md5:{md5}" if md5 else entry["id"], size)
+        unique_bytes = sum(unique.values())
+        return {
+            "charts": charts,
+            "unique": len(unique),
+            "duplicates": charts - len(unique),
+            "bytes": total,
+            "unique_bytes": unique_bytes,
+            "saved_pct": round(100 * (total - unique_bytes) / total, 1) if total else 0.0,
+            "no_checksum": no_checksum,
+        }
+
+    # --- PERSISTENCE ---
+    # Entries are stored as flat lists to keep the file small.
+
+    _FIELDS = ("name", "id", "md5Checksum", "modifiedTime", "size")
+
+    def save(self, path):
+        packed = {
+            var1: {
+                var2: {
+                    filt: {str(b): [entry.get(f) for f in self._FIELDS] for b, entry in bins.items()}
+                    for filt, bins in filters.items()
+                }
+                for var2, filters in by_var2.items()
+            }
+            for var1, by_var2 in self.tree.items()
+        }
+        payload = {"version": INDEX_FORMAT_VERSION, "fingerprint": self.fingerprint, "tree": packed}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8")))
+
+    @classmethod
+    def load(cls, path):
+        """Returns the saved index, or None if missing, unreadable or from an older format."""
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            return None
+        tree = {
+            var1: {
+                var2: {
+                    filt: {int(b): dict(zip(cls._FIELDS, packed)) for b, packed in bins.items()}
+                    for filt, bins in filters.items()
+                }
+                for var2, filters in by_var2.items()
+            }
+            for var1, by_var2 in payload["tree"].items()
+        }
+        return cls(tree, payload.get("fingerprint"))
+
+
+# ==========================================
+# COMMAND LINE (dedup report)
+# ==========================================
+# python chart_index.py .cache/index/hexbin.json.gz .cache/index/ratio.json.gz
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report duplicate charts in saved chart indexes.")
+    parser.add_argument("paths", nargs="+", help="saved index (.json.gz)")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for path in args.paths:
+        index = ChartIndex.load(path)
+        if index is None:
+            print(f"{path}: not a chart index", file=sys.stderr)
+            status = 1
+            continue
+        r = index.dedup_report()
+        print(f"{path}: {r['charts']} charts, {r['unique']} unique ({r['duplicates']} duplicates), "
+              f"{r['bytes'] / (1024 * 1024):.1f} MB -> {r['unique_bytes'] / (1024 * 1024):.1f} MB (-{r['saved_pct']}%)"
+              + (f", {r['no_checksum']} without checksum" if r["no_checksum"] else ""))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import html
+import json
+
+import streamlit.components.v1 as components
+
+from renditions import picture_html
+
+# ==========================================
+# CLIENT-SIDE CHART VIEWER
+# ==========================================
+# Renders every bin threshold of one var1/var2/filter combination into a
+# single component and switches between them in the browser, so moving
+# the "Bin Threshold" slider costs no rerun and no server round trip.
+# All images are in the DOM from the start, so the browser fetches them
+# once up front (they are static, long-cached URLs - see media.py).
+# The component runs in an iframe, which doesn't inherit the app CSS:
+# the image classes are repeated here.
+
+VIEWER_CSS = """
+body { margin: 0; font-family: 'Garamond', 'Georgia', serif; color: #374151; background: #ffffff; }
+@keyframes fadeIn {
+    from { opacity: 0; transform: translateY(10px); }
+    to { opacity: 1; transform: translateY(0); }
+}
+.fade-in-image {
+    animation: fadeIn 0.6s ease-out;
+    width: 100%;
+    border-radius: 2px;
+    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
+    border: 1px solid #e5e7eb;
+    margin-bottom: 10px;
+    box-sizing: border-box;
+}
+.fade-in-image-small {
+    animation: fadeIn 0.6s ease-out;
+    width: 65%;
+    display: block;
+    margin-left: auto;
+    margin-right: auto;
+    border-radius: 2px;
+    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
+    border: 1px solid #e5e7eb;
+}
+.viewer-controls { display: flex; align-items: center; gap: 12px; margin: 4px 0 12px 0; }
+.viewer-controls label { font-size: 15px; font-weight: 600; white-space: nowrap; }
+.viewer-controls input { flex: 1; accent-color: #3b82f6; }
+.viewer-frame { display: none; }
+.viewer-frame.active { display: block; }
+"""
+
+VIEWER_SCRIPT = """
+const bins = %(bins)s;
+const slider = document.getElementById("bin-slider");
+const label = document.getElementById("bin-value");
+const frames = document.querySelectorAll(".viewer-frame");
+
+function fitFrame() {
+    // Grow/shrink the iframe to the visible chart.
+    if (window.frameElement) {
+        window.frameElement.style.height = document.body.scrollHeight + "px";
+    }
+}
+function show(i) {
+    frames.forEach((f, j) => f.classList.toggle("active", i === j));
+    label.textContent = bins[i];
+    fitFrame();
+}
+slider.addEventListener("input", () => show(Number(slider.value)));
+document.querySelectorAll("img").forEach(img => img.addEventListener("load", fitFrame));
+window.addEventListener("resize", fitFrame);
+show(Number(slider.value));
+"""
+
+
+def chart_viewer_html(frames, css_class, sizes, initial=0):
+    """frames: list of (bin_value, urls) in slider order, urls as returned by RenditionPipeline.publish."""
+    bins = [b for b, _ in frames]
+    pictures = "".join(
+        f'<div class="viewer-frame" data-bin="{html.escape(str(b))}">{picture_html(urls, css_class, sizes)}</div>'
+        for b, urls in frames
+    )
+    return f"""
+<style>{VIEWER_CSS}</style>
+<div class="viewer-controls">
+    <label for="bin-slider">Bin Threshold: <span id="bin-value">{bins[initial]}</span></label>
+    <input id="bin-slider" type="range" min="0" max="{len(bins) - 1}" step="1" value="{initial}">
+</div>
+{pictures}
+<script>{VIEWER_SCRIPT % {"bins": json.dumps(bins)}}</script>
+"""
+
+
+def chart_viewer(frames, css_class="fade-in-image", sizes="100vw", height=720):
+    """Shows the viewer. `height` is only the initial size; the frame resizes to its chart."""
+    components.html(chart_viewer_html(frames, css_class, sizes), height=height)
+
+
+# ==========================================
+# SMALL MULTIPLES (grid of thumbnails)
+# ==========================================
+# Every bin threshold (or every filter variable) side by side as server-made
+# thumbnails. Clicking one swaps the grid for the full-size chart in the
+# same frame; "Back to grid" returns.
+
+GRID_CSS = """
+.chart-grid { display: grid; grid-template-columns: repeat(%(columns)d, 1fr); gap: 10px; }
+.grid-cell { cursor: zoom-in; margin: 0; }
+.grid-cell img { width: 100%%; border: 1px solid #e5e7eb; border-radius: 2px; box-shadow: 0 1px 3px rgba(0, 0, 0, 0.08); }
+.grid-cell:hover img { border-color: #3b82f6; }
+.grid-cell figcaption { font-size: 14px; text-align: center; margin-top: 2px; }
+.grid-full { display: none; }
+.grid-full button { font-family: inherit; font-size: 14px; margin-bottom: 8px; padding: 4px 12px; cursor: pointer;
+    background: #ffffff; border: 1px solid #d1d5db; border-radius: 4px; }
+.grid-full span { font-size: 15px; font-weight: 600; margin-left: 10px; }
+"""
+
+GRID_SCRIPT = """
+const grid = document.getElementById("chart-grid");
+const full = document.getElementById("grid-full");
+const fullImg = document.getElementById("grid-full-img");
+const fullLabel = document.getElementById("grid-full-label");
+
+function fitFrame() {
+    if (window.frameElement) {
+        window.frameElement.style.height = document.body.scrollHeight + "px";
+    }
+}
+document.querySelectorAll(".grid-cell").forEach(cell => cell.addEventListener("click", () => {
+    fullImg.src = cell.dataset.full;
+    fullLabel.textContent = cell.dataset.label;
+    grid.style.display = "none";
+    full.style.display = "block";
+    fitFrame();
+}));
+document.getElementById("grid-back").addEventListener("click", () => {
+    full.style.display = "none";
+    grid.style.display = "grid";
+    fitFrame();
+});
+document.querySelectorAll("img").forEach(img => img.addEventListener("load", fitFrame));
+window.addEventListener("resize", fitFrame);
+fitFrame();
+"""
+
+
+def chart_grid_html(cells, css_class, columns=5):
+    """cells: list of (label, urls), urls as returned by RenditionPipeline.thumbnail."""
+    figures = "".join(
+        f'<figure class="grid-cell" data-full="{html.escape(urls["png"])}" data-label="{html.escape(str(label))}">'
+        f'<img src="{html.escape(urls["thumb"])}" loading="lazy" alt="{html.escape(str(label))}">'
+        f'<figcaption>{html.escape(str(label))}</figcaption></figure>'
+        for label, urls in cells
+    )
+    return f"""
+<style>{VIEWER_CSS}{GRID_CSS % {"columns": columns}}</style>
+<div class="chart-grid" id="chart-grid">{figures}</div>
+<div class="grid-full" id="grid-full">
+    <button id="grid-back">&larr; Back to grid</button><span id="grid-full-label"></span>
+    <img id="grid-full-img" class="{css_class}">
+</div>
+<script>{GRID_SCRIPT}</script>
+"""
+
+
+def chart_grid(cells, css_class="fade-in-image", columns=5, height=480):
+    """Shows the grid. `height` is only the initial size; the frame resizes to its content."""
+    components.html(chart_grid_html(cells, css_class, columns), height=height)
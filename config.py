@@ -0,0 +1,160 @@
+import os
+
+# ==========================================
+# RUNTIME SETTINGS
+# ==========================================
+# Everything here can be overridden with environment variables so the same
+# code runs on Streamlit Cloud, on our own replicas and on a laptop.
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+# Where downloaded charts and other derived files are kept between restarts.
+CACHE_DIR = os.environ.get("DATA_PALETTE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+# Image cache budgets (in MB).
+IMAGE_CACHE_MEMORY_MB = _env_int("DATA_PALETTE_IMAGE_CACHE_MEMORY_MB", 256)
+IMAGE_CACHE_DISK_MB = _env_int("DATA_PALETTE_IMAGE_CACHE_DISK_MB", 2048)
+
+# Published charts and renditions go to <STATIC_DIR>/charts (see media.py);
+# the least recently served are removed past STATIC_CHARTS_MB. Streamlit
+# only serves ./static, so only tools (the benchmark) should move it.
+STATIC_DIR = os.environ.get("DATA_PALETTE_STATIC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+STATIC_CHARTS_MB = _env_int("DATA_PALETTE_STATIC_CHARTS_MB", 1024)
+
+# Cache shared by every replica on the host (see shared_cache.py): folder
+# listings, manifests and downloaded charts. Point all replicas at the
+# same directory so only one of them goes to Drive for each item.
+SHARED_CACHE_DIR = os.environ.get("DATA_PALETTE_SHARED_CACHE_DIR", os.path.join(CACHE_DIR, "shared"))
+
+# ==========================================
+# GOOGLE DRIVE CONFIGURATION
+# ==========================================
+# 1. Open the folder/file in Google Drive.
+# 2. Look at the URL. 
+#    Folder: .../drive/folders/YOUR_ID_HERE
+#    File: .../file/d/YOUR_ID_HERE/view
+
+DRIVE_FOLDER_ID_HEXBIN = "1Jo8J3dCrfFlCWBpuA6S6LuSBEZlYWQiz"
+DRIVE_FOLDER_ID_RATIO = "1OJEmNqsypkt2zSNn7GFM_TB0bHOtnxwA"
+FILE_ID_NAMES_TXT = "1absVXCyBftpjuYQYY9yWDOBD55REXJHb"
+FILE_ID_NAMES2_TXT = "1ISKIsGYcA9uV0Xd5eAaScHW5e_0zW38r"
+
+# ==========================================
+# STORAGE BACKEND
+# ==========================================
+# "drive" - read everything from Google Drive (default).
+# "local" - read from a local mirror laid out by folder/file id.
+# "fake"  - in-memory simulated Drive (fake_drive.py), for benchmarks.
+
+STORAGE_BACKEND = os.environ.get("DATA_PALETTE_STORAGE", "drive")
+LOCAL_STORAGE_ROOT = os.environ.get("DATA_PALETTE_LOCAL_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "mirror"))
+
+# ==========================================
+# PREFETCH
+# ==========================================
+# Threads used to fetch neighbouring charts in the background, and whether
+# to also warm the other filter variables for the current pair.
+
+PREFETCH_WORKERS = _env_int("DATA_PALETTE_PREFETCH_WORKERS", 4)
+PREFETCH_FILTERS = os.environ.get("DATA_PALETTE_PREFETCH_FILTERS", "0") == "1"
+
+# ==========================================
+# CHART CORPORA
+# ==========================================
+# Each dashboard reads one manifest (list of chart file names) and one
+# image folder. The chart index (chart_index.py) joins the two.
+
+CORPORA = {
+    "hexbin": {"manifest": FILE_ID_NAMES_TXT, "manifest_name": "names.txt", "folder": DRIVE_FOLDER_ID_HEXBIN, "ratio": False},
+    "ratio": {"manifest": FILE_ID_NAMES2_TXT, "manifest_name": "names2.txt", "folder": DRIVE_FOLDER_ID_RATIO, "ratio": True},
+}
+
+# How often the manifests are checked against their Drive metadata
+# (seconds). Only a changed manifest is downloaded again, and the chart
+# index is rebuilt only when its manifest or folder listing changed.
+# Both checks run in the background; pages keep the last good version
+# until the new one has arrived (see revalidate.py).
+REVALIDATE_INTERVAL = _env_int("DATA_PALETTE_REVALIDATE_INTERVAL", 60)
+
+# How often the folder listings are brought up to date (seconds). Cheap,
+# since a refresh only reads the Drive changes feed.
+LISTING_REFRESH_INTERVAL = _env_int("DATA_PALETTE_LISTING_REFRESH", 300)
+
+# The changes feed can miss items, so a listing is rebuilt from a full
+# re-list once its last one is older than this (seconds).
+FULL_RELIST_INTERVAL = _env_int("DATA_PALETTE_FULL_RELIST", 24 * 3600)
+
+# Concurrent Drive connections (kept alive and reused between requests).
+DRIVE_POOL_SIZE = _env_int("DATA_PALETTE_DRIVE_POOL_SIZE", 8)
+
+# The Google client is only imported when a dashboard first needs Drive.
+# With warm-up on, it is loaded in the background right after the first
+# page is sent, so neither the static pages nor the first dashboard wait.
+WARM_UP = os.environ.get("DATA_PALETTE_WARM_UP", "1") == "1"
+
+# ==========================================
+# LIVE RENDERING (optional)
+# ==========================================
+# Point DATA_PALETTE_DATASET at the applicant table (.parquet or
+# .feather/.arrow) to let the dashboards render any combination on demand
+# (see hexbin_engine.py). Unset = pre-rendered charts only.
+
+DATASET_PATH = os.environ.get("DATA_PALETTE_DATASET")
+DATASET_TARGET = os.environ.get("DATA_PALETTE_DATASET_TARGET", "TARGET")
+HEXBIN_GRIDSIZE = _env_int("DATA_PALETTE_HEXBIN_GRIDSIZE", 40)
+
+# ==========================================
+# MAPPING DICTIONARY
+# ==========================================
+# Display label of every chart variable.
+
+VARIABLE_MAPPINGS = {
+"df1_AMT_ANNUITY": "Loan Annuity",
+"df1_AMT_CREDIT": "Credit Amount",
+"df1_AMT_INCOME_TOTAL": "Total Income",
+"df1_AMT_REQ_CREDIT_BUREAU_MON": "Credit Bureau Enquiries (Monthly)",
+"df1_APARTMENTS_AVG": "Average Apartment Size",
+"df1_DAYS_BIRTH": "Age (Days)",
+"df1_DAYS_EMPLOYED": "Days Employed",
+"df1_DAYS_LAST_PHONE_CHANGE": "Days Since Last Phone Change",
+"df1_DAYS_REGISTRATION": "Registration Days",
+"df1_CODE_GENDER": "Gender",
+"df1_FLAG_OWN_CAR": "Car Ownership",
+"df1_FLAG_OWN_REALTY": "Realty Ownership",
+"df1_CNT_CHILDREN": "Child Count",
+"df1_NAME_EDUCATION_TYPE": "Education Level",
+"df1_NAME_FAMILY_STATUS": "Family Status",
+"df1_NAME_HOUSING_TYPE": "Housing Type",
+"df1_NAME_INCOME_TYPE": "Income Type",
+"df1_OCCUPATION_TYPE": "Occupation",
+"df1_ORGANIZATION_TYPE": "Organization Type",
+"df1_EXT_SOURCE_1": "External Source 1",
+"df1_EXT_SOURCE_2": "External Source 2",
+"df1_EXT_SOURCE_3": "External Source 3"
+}
+
+# The chart variables. Only these columns and the target are read from the
+# dataset; override with a comma-separated DATA_PALETTE_VARIABLES.
+LIVE_VARIABLES = [v.strip() for v in os.environ.get("DATA_PALETTE_VARIABLES", "").split(",") if v.strip()] or list(VARIABLE_MAPPINGS)
+
+# ==========================================
+# AGGREGATE CUBES (optional)
+# ==========================================
+# Folder holding one <var1>_vs_<var2>.npz per pair (see aggregate_cube.py).
+# When set, both dashboards offer an interactive chart drawn from the
+# counts instead of the pre-rendered images. Empty = disabled.
+
+DRIVE_FOLDER_ID_CUBES = os.environ.get("DATA_PALETTE_CUBE_FOLDER", "")
+
+# ==========================================
+# METRICS
+# ==========================================
+# DATA_PALETTE_METRICS_PORT=9100 serves Prometheus metrics on that port
+# (0 = off). DATA_PALETTE_DEBUG=1 adds a metrics panel to the sidebar.
+
+METRICS_PORT = _env_int("DATA_PALETTE_METRICS_PORT", 0)
+DEBUG_PANEL = os.environ.get("DATA_PALETTE_DEBUG", "0") == "1"
@@ -0,0 +1,210 @@
+import hashlib
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+# ==========================================
+# IN-MEMORY FAKE OF THE DRIVE v3 SERVICE
+# ==========================================
+# Implements just the calls DriveStorage makes (files.list / get /
+# get_media and changes.getStartPageToken / list) with the same fluent
+# `service.files().list(...).execute()` shape, so DriveStorage and
+# everything above it can run offline:
+#
+#     drive = FakeDriveService()
+#     drive.put_file("folder", "chart.png", png_bytes)
+#     storage = DriveStorage(drive)
+#
+# For benchmarks it can also simulate a slow, flaky Drive: fixed latency
+# per request, a bandwidth cap on downloads and a rate of transient
+# errors (503/429). The app picks up `default_service()` when run with
+# DATA_PALETTE_STORAGE=fake (see benchmark.py).
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status, message=""):
+        super().__init__(f"{status} {message}".strip())
+        self.status = status
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, http=None, num_retries=0):
+        return self._fn()
+
+
+class _Files:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def list(self, q=None, fields=None, pageToken=None, pageSize=100, **kwargs):
+        return _Request(lambda: self._drive._list(q, pageToken, pageSize))
+
+    def get(self, fileId=None, fields=None, **kwargs):
+        return _Request(lambda: self._drive._get(fileId))
+
+    def get_media(self, fileId=None, **kwargs):
+        return _Request(lambda: self._drive._get_media(fileId))
+
+
+class _Changes:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return _Request(lambda: self._drive._call("changes.getStartPageToken", lambda: {"startPageToken": str(len(self._drive._changes))}))
+
+    def list(self, pageToken=None, fields=None, pageSize=100, **kwargs):
+        return _Request(lambda: self._drive._list_changes(pageToken, pageSize))
+
+
+class FakeDriveService:
+    def __init__(self, latency=0.0, bandwidth=None, error_rate=0.0, seed=None):
+        self.latency = latency        # seconds added to every request
+        self.bandwidth = bandwidth    # bytes/second for downloads, None = unlimited
+        self.error_rate = error_rate  # share of requests failing with 503/429
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}      # file_id -> {id, name, parents, data, modifiedTime, trashed}
+        self._changes = []    # ordered list of changed file ids
+        self._ids = itertools.count(1)
+        self.calls = {}       # "files.list" -> count, ...
+
+    # --- FLUENT API ---
+
+    def files(self):
+        return _Files(self)
+
+    def changes(self):
+        return _Changes(self)
+
+    # --- MUTATORS (test / benchmark setup) ---
+
+    def put_file(self, folder_id, name, data, file_id=None):
+        """Creates or replaces a file; returns its id."""
+        with self._lock:
+            if file_id is None:
+                existing = [f for f in self._files.values() if f["name"] == name and folder_id in f["parents"]]
+                file_id = existing[0]["id"] if existing else f"fake{next(self._ids)}"
+            self._files[file_id] = {
+                "id": file_id,
+                "name": name,
+                "parents": [folder_id] if folder_id else [],
+                "data": bytes(data),
+                "modifiedTime": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                "trashed": False,
+            }
+            self._changes.append(file_id)
+        return file_id
+
+    def remove_file(self, file_id):
+        with self._lock:
+            self._files.pop(file_id, None)
+            self._changes.append(file_id)
+
+    # --- HANDLERS ---
+
+    def _call(self, name, fn):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+            status = self._random.choice((503, 429)) if fail else None
+        if self.latency:
+            time.sleep(self.latency)
+        if status:
+            raise FakeHttpError(status, "Simulated error")
+        result = fn()
+        if self.bandwidth and isinstance(result, bytes):
+            time.sleep(len(result) / self.bandwidth)
+        return result
+
+    @staticmethod
+    def _meta(f):
+        return {
+            "id": f["id"],
+            "name": f["name"],
+            "md5Checksum": hashlib.md5(f["data"]).hexdigest(),
+            "modifiedTime": f["modifiedTime"],
+            "size": str(len(f["data"])),
+            "parents": list(f["parents"]),
+            "trashed": f["trashed"],
+        }
+
+    def _list(self, q, page_token, page_size):
+        def run():
+            # Only the "'<folder>' in parents" form DriveStorage uses is supported.
+            folder_id = q.split("'")[1] if q else None
+            with self._lock:
+                matches = sorted((f for f in self._files.values() if folder_id in f["parents"] and not f["trashed"]), key=lambda f: f["name"])
+            start = int(page_token or 0)
+            page = matches[start:start + page_size]
+            result = {"files": [self._meta(f) for f in page]}
+            if start + page_size < len(matches):
+                result["nextPageToken"] = str(start + page_size)
+            return result
+        return self._call("files.list", run)
+
+    def _get(self, file_id):
+        def run():
+            with self._lock:
+                f = self._files.get(file_id)
+            if f is None:
+                raise FakeHttpError(404, f"File not found: {file_id}")
+            return self._meta(f)
+        return self._call("files.get", run)
+
+    def _get_media(self, file_id):
+        def run():
+            with self._lock:
+                f = self._files.get(file_id)
+            if f is None:
+                raise FakeHttpError(404, f"File not found: {file_id}")
+            return f["data"]
+        return self._call("files.get_media", run)
+
+    def _list_changes(self, page_token, page_size):
+        def run():
+            start = int(page_token)
+            with self._lock:
+                if start > len(self._changes):
+                    raise FakeHttpError(410, "Invalid page token")
+                ids = self._changes[start:start + page_size]
+                end = start + len(ids)
+                changes = []
+                for file_id in ids:
+                    f = self._files.get(file_id)
+                    if f is None:
+                        changes.append({"fileId": file_id, "removed": True})
+                    else:
+                        changes.append({"fileId": file_id, "removed": False, "file": self._meta(f)})
+                done = end >= len(self._changes)
+            result = {"changes": changes}
+            if done:
+                result["newStartPageToken"] = str(end)
+            else:
+                result["nextPageToken"] = str(end)
+            return result
+        return self._call("changes.list", run)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_service():
+    """The process-wide fake used by the "fake" storage backend."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = FakeDriveService()
+        return _default
+
+
+def set_default_service(service):
+    global _default
+    with _default_lock:
+        _default = service
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from metrics import LISTING_REFRESH
+from mirror import write_atomic
+
+# ==========================================
+# INCREMENTAL FOLDER LISTING
+# ==========================================
+# Keeps {filename: meta} for one folder up to date from the Drive changes
+# feed: the first refresh does a full listing and remembers a changes
+# cursor, every later refresh only fetches what changed since. If the
+# cursor is rejected (expired, backend without a feed, any error while
+# applying changes) we fall back to a full re-list. A full re-list is also
+# forced once the last one is older than full_relist_interval, so anything
+# the feed missed (it is not guaranteed to be complete) is eventually
+# picked up.
+# State is saved to disk so a restarted process resumes from its cursor.
+# `version` changes whenever the listing does, so structures derived from
+# it (the chart index) know when to rebuild.
+
+logger = logging.getLogger(__name__)
+
+
+def listing_version(files):
+    h = hashlib.sha1()
+    for name in sorted(files):
+        meta = files[name]
+        h.update(f"{name}\0{meta['id']}\0{meta.get('md5Checksum') or meta.get('modifiedTime')}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class FolderListing:
+    def __init__(self, storage, folder_id, state_path=None, full_relist_interval=None):
+        self.storage = storage
+        self.folder_id = folder_id
+        self.state_path = state_path
+        self.full_relist_interval = full_relist_interval  # seconds; None never forces one
+        self.files = {}
+        self.cursor = None
+        self.version = None
+        self.listed_at = 0.0  # wall-clock time of the last full listing
+        self.full_listings = 0
+        self.incremental_refreshes = 0
+        self._lock = threading.Lock()
+        self._load_state()
+
+    # --- PERSISTENCE ---
+
+    def _load_state(self):
+        if not self.state_path: return
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get("folder_id") != self.folder_id: return
+        self.files = state.get("files", {})
+        self.cursor = state.get("cursor")
+        self.version = state.get("version")
+        self.listed_at = state.get("listed_at", 0.0)
+
+    def _save_state(self):
+        if not self.state_path: return
+        state = {"folder_id": self.folder_id, "cursor": self.cursor, "version": self.version, "listed_at": self.listed_at, "files": self.files}
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            write_atomic(self.state_path, json.dumps(state, separators=(",", ":")).encode("utf-8"))
+        except OSError:
+            pass
+
+    # --- REFRESH ---
+
+    def _full_listing(self):
+        # Take the cursor *before* listing so nothing changed during the
+        # listing is missed; replaying a change twice is harmless.
+        cursor = self.storage.start_page_token() if self.storage.supports_changes else None
+        self.files = self.storage.list_folder(self.folder_id)
+        self.cursor = cursor
+        self.listed_at = time.time()
+        self.full_listings += 1
+
+    def _relist_due(self):
+        if self.full_relist_interval is None: return False
+        return time.time() - self.listed_at > self.full_relist_interval
+
+    def _apply_changes(self):
+        changes, cursor = self.storage.list_changes(self.cursor)
+        self.incremental_refreshes += 1
+        if not changes:
+            self.cursor = cursor
+            return 0
+        files = dict(self.files)
+        names_by_id = {meta["id"]: name for name, meta in files.items()}
+        for change in changes:
+            old_name = names_by_id.pop(change["fileId"], None)
+            if old_name is not None:
+                files.pop(old_name, None)
+            item = change["file"]
+            if change["removed"] or item is None or item["trashed"] or self.folder_id not in item["parents"]:
+                continue
+            files[item["name"]] = {k: item[k] for k in ("id", "md5Checksum", "modifiedTime", "size")}
+            names_by_id[item["id"]] = item["name"]
+        self.files = files
+        self.cursor = cursor
+        return len(changes)
+
+    def refresh(self):
+        """Brings the listing up to date. Raises if even a full listing fails."""
+        with self._lock:
+            before = self.files
+            if self.cursor and self.storage.supports_changes and not self._relist_due():
+                try:
+                    with LISTING_REFRESH.time(mode="changes"):
+                        self._apply_changes()
+                except Exception as e:
+                    logger.warning("Changes feed failed for %s, re-listing: %s", self.folder_id, e)
+                    with LISTING_REFRESH.time(mode="full"):
+                        self._full_listing()
+            else:
+                with LISTING_REFRESH.time(mode="full"):
+                    self._full_listing()
+            if self.files is not before or self.version is None:
+                self.version = listing_version(self.files)
+            self._save_state()
+            return self.files
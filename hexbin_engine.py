@@ -0,0 +1,312 @@
+import io
+import logging
+import math
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from config import LIVE_VARIABLES
+
+# ==========================================
+# LIVE HEXBIN ENGINE
+# ==========================================
+# Renders the "Defaulters Vs Non Defaulters" and "Islands of Stability"
+# charts on demand from the applicant table, instead of relying on a
+# pre-rendered PNG for every var1 x var2 x filter x bin combination.
+#
+#   - The table is read once (Parquet or Arrow/Feather), keeping only the
+#     declared chart variables (config.LIVE_VARIABLES) and the target column.
+#   - "bin_ge_N" keeps the rows whose filter variable falls in decile N or
+#     above (deciles 0-9 of that variable).
+#   - Hexbin counts are computed with NumPy on the same lattice matplotlib's
+#     hexbin uses, separately for defaulters (target == 1) and the rest.
+
+BINS = list(range(10))
+DEFAULT_GRIDSIZE = 40
+DEFAULT_TARGET = "TARGET"
+
+# Canvas layout (pixels)
+WIDTH, HEIGHT = 1400, 1000
+MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 110, 40, 40, 90
+
+NON_DEFAULTER_RGB = (21, 101, 192)   # legend blue (#1565c0)
+DEFAULTER_RGB = (198, 40, 40)        # legend red (#c62828)
+RATIO_LOW_RGB = (46, 125, 50)        # mostly non-defaulters
+RATIO_HIGH_RGB = (198, 40, 40)       # mostly defaulters
+RATIO_MIN_COUNT = 5                  # hexes with fewer applicants are left blank
+COMPUTE_CACHE_SIZE = 512             # selections kept per engine
+
+logger = logging.getLogger(__name__)
+
+
+class HexbinResult:
+    """Counts for one selection: one value per hex on the two lattices, flattened."""
+    def __init__(self, centers, defaulters, non_defaulters, extent, hex_size):
+        self.centers = centers              # (n, 2) data coordinates
+        self.defaulters = defaulters        # (n,) int
+        self.non_defaulters = non_defaulters
+        self.extent = extent                # (xmin, xmax, ymin, ymax)
+        self.hex_size = hex_size            # (sx, sy) lattice spacing
+
+    @property
+    def ratio(self):
+        """Share of defaulters per hex; NaN where there are too few applicants."""
+        total = self.defaulters + self.non_defaulters
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratio = self.defaulters / total
+        ratio[total < RATIO_MIN_COUNT] = np.nan
+        return ratio
+
+
+def hexbin_counts(gridsize, extent):
+    """
+    Vectorized hexbin on matplotlib's two offset lattices over `extent`.
+    Returns (centers, (sx, sy), counts) where counts(xs, ys) bins points
+    onto those centers.
+    """
+    xmin, xmax, ymin, ymax = extent
+    nx = gridsize
+    ny = max(1, int(nx / math.sqrt(3)))
+    sx = (xmax - xmin) / nx or 1.0
+    sy = (ymax - ymin) / ny or 1.0
+
+    # Lattice 1: (nx+1) x (ny+1) points on the grid; lattice 2: nx x ny offset by half a cell.
+    i1, j1 = np.meshgrid(np.arange(nx + 1), np.arange(ny + 1), indexing="ij")
+    i2, j2 = np.meshgrid(np.arange(nx), np.arange(ny), indexing="ij")
+    centers = np.concatenate([
+        np.column_stack([xmin + i1.ravel() * sx, ymin + j1.ravel() * sy]),
+        np.column_stack([xmin + (i2.ravel() + 0.5) * sx, ymin + (j2.ravel() + 0.5) * sy]),
+    ])
+
+    def counts(xs, ys):
+        ix = (xs - xmin) / sx
+        iy = (ys - ymin) / sy
+        ix1, iy1 = np.round(ix), np.round(iy)
+        ix2, iy2 = np.floor(ix), np.floor(iy)
+        d1 = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2
+        d2 = (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+        on_first = d1 < d2
+
+        idx1 = (np.clip(ix1, 0, nx) * (ny + 1) + np.clip(iy1, 0, ny)).astype(np.int64)
+        idx2 = (np.clip(ix2, 0, nx - 1) * ny + np.clip(iy2, 0, ny - 1)).astype(np.int64)
+        n1 = (nx + 1) * (ny + 1)
+        c1 = np.bincount(idx1[on_first], minlength=n1)
+        c2 = np.bincount(idx2[~on_first], minlength=nx * ny)
+        return np.concatenate([c1, c2])
+
+    return centers, (sx, sy), counts
+
+
+class HexbinEngine:
+    def __init__(self, path, target=DEFAULT_TARGET, gridsize=DEFAULT_GRIDSIZE, variables=None, optimize_png=False):
+        self.path = path
+        self.target = target
+        self.gridsize = gridsize
+        # Optimizing takes most of the render time; worth it only for files
+        # rendered once and served many times (prerender), not live.
+        self.optimize_png = optimize_png
+        # The charts call the variables df1_<COLUMN>; accept either spelling.
+        self.requested = [v if v.startswith("df1_") else f"df1_{v}" for v in variables or LIVE_VARIABLES]
+        st = os.stat(path)
+        # Changes whenever the dataset file is replaced; part of every cache key.
+        self.version = f"{int(st.st_mtime)}-{st.st_size}"
+        self._columns, self._is_defaulter = self._load(path)
+        self._decile_lock = threading.Lock()
+        self._deciles = {}
+        # Per engine, so a replaced engine (new dataset) takes its cache with it.
+        self.compute = lru_cache(maxsize=COMPUTE_CACHE_SIZE)(self._compute)
+
+    # --- LOADING ---
+
+    def _load(self, path):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        if path.endswith((".feather", ".arrow")):
+            schema = feather.read_table(path, memory_map=True).schema
+        else:
+            schema = pq.read_schema(path)
+
+        # Only the requested variables are read (the table has ~120 columns),
+        # whether the column is called df1_<NAME> or just <NAME>.
+        present = set(schema.names) - {self.target}
+        wanted = {}
+        for key in self.requested:
+            for name in (key, key[len("df1_"):]):
+                if name in present:
+                    wanted[key] = name
+                    break
+        missing = [key for key in self.requested if key not in wanted]
+        if missing:
+            logger.warning("Dataset %s has no column for %s", path, ", ".join(missing))
+        read = list(wanted.values()) + [self.target]
+        if path.endswith((".feather", ".arrow")):
+            table = feather.read_table(path, columns=read, memory_map=True)
+        else:
+            table = pq.read_table(path, columns=read)
+
+        columns = {}
+        for key, name in wanted.items():
+            col = table.column(name)
+            if pa.types.is_integer(col.type) or pa.types.is_floating(col.type) or pa.types.is_boolean(col.type):
+                columns[key] = col.to_numpy(zero_copy_only=False).astype(np.float64)
+            else:
+                # Categorical (gender, education, ...): plot category codes.
+                encoded = col.dictionary_encode().combine_chunks()
+                codes = encoded.indices.to_numpy(zero_copy_only=False).astype(np.float64)
+                codes[encoded.is_null().to_numpy(zero_copy_only=False)] = np.nan
+                columns[key] = codes
+        target = table.column(self.target).to_numpy(zero_copy_only=False)
+        return columns, np.asarray(target == 1)
+
+    # --- OPTIONS (same shape as ChartIndex, so the pages can use either) ---
+
+    def variables(self):
+        return sorted(self._columns)
+
+    def var1_options(self):
+        return self.variables()
+
+    def var2_options(self, var1):
+        return self.variables()
+
+    def filter_options(self, var1, var2):
+        return self.variables()
+
+    def bins(self, var1, var2, filt):
+        return BINS
+
+    def __len__(self):
+        return len(self._columns)
+
+    def column(self, var):
+        return self._columns[var]
+
+    @property
+    def is_defaulter(self):
+        return self._is_defaulter
+
+    # --- COMPUTE ---
+
+    def decile_of(self, filt):
+        """Decile (0-9) of every row for the filter variable; -1 for missing."""
+        with self._decile_lock:
+            if filt not in self._deciles:
+                values = self._columns[filt]
+                edges = np.nanquantile(values, np.linspace(0, 1, 11)[1:-1]) if np.isfinite(values).any() else np.zeros(9)
+                deciles = np.searchsorted(edges, values, side="right")
+                deciles[~np.isfinite(values)] = -1
+                self._deciles[filt] = deciles
+            return self._deciles[filt]
+
+    def _compute(self, var1, var2, filt, bin_val):
+        x = self._columns[var1]
+        y = self._columns[var2]
+        valid = np.isfinite(x) & np.isfinite(y)
+        extent = (np.min(x[valid]), np.max(x[valid]), np.min(y[valid]), np.max(y[valid])) if valid.any() else (0.0, 1.0, 0.0, 1.0)
+        # Same axes for every bin, so sweeping thresholds doesn't jump around.
+        keep = valid & (self.decile_of(filt) >= bin_val)
+
+        centers, hex_size, counts = hexbin_counts(self.gridsize, extent)
+        defaulted = keep & self._is_defaulter
+        repaid = keep & ~self._is_defaulter
+        return HexbinResult(
+            centers,
+            counts(x[defaulted], y[defaulted]),
+            counts(x[repaid], y[repaid]),
+            extent,
+            hex_size,
+        )
+
+    def render(self, var1, var2, filt, bin_val, ratio=False):
+        """PNG bytes for the hexbin (or ratio) chart of one selection."""
+        result = self.compute(var1, var2, filt, bin_val)
+        draw = render_ratio_png if ratio else render_hexbin_png
+        return draw(result, var1, var2, optimize=self.optimize_png)
+
+
+# ==========================================
+# DRAWING (Pillow)
+# ==========================================
+
+def _hexagon(cx, cy, sx, sy):
+    # Same hexagon matplotlib draws around each lattice point.
+    offsets = ((0.5, -0.5), (0.5, 0.5), (0.0, 1.0), (-0.5, 0.5), (-0.5, -0.5), (0.0, -1.0))
+    return [(cx + dx * sx, cy + dy * sy / 3.0) for dx, dy in offsets]
+
+
+def _canvas(result, var1, var2):
+    img = Image.new("RGBA", (WIDTH, HEIGHT), (255, 255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    plot = (MARGIN_LEFT, MARGIN_TOP, WIDTH - MARGIN_RIGHT, HEIGHT - MARGIN_BOTTOM)
+    draw.rectangle(plot, outline=(229, 231, 235), width=2)
+
+    xmin, xmax, ymin, ymax = result.extent
+    for i in range(6):
+        fx = i / 5
+        px = plot[0] + fx * (plot[2] - plot[0])
+        py = plot[3] - fx * (plot[3] - plot[1])
+        draw.text((px, plot[3] + 8), f"{xmin + fx * (xmax - xmin):.3g}", fill=(55, 65, 81), font=font, anchor="ma")
+        draw.text((plot[0] - 8, py), f"{ymin + fx * (ymax - ymin):.3g}", fill=(55, 65, 81), font=font, anchor="rm")
+    draw.text(((plot[0] + plot[2]) / 2, HEIGHT - 30), var1, fill=(17, 24, 39), font=font, anchor="mm")
+    draw.text((20, plot[1] - 20), var2, fill=(17, 24, 39), font=font)
+    return img, plot
+
+
+def _to_pixels(result, plot):
+    xmin, xmax, ymin, ymax = result.extent
+    kx = (plot[2] - plot[0]) / ((xmax - xmin) or 1.0)
+    ky = (plot[3] - plot[1]) / ((ymax - ymin) or 1.0)
+    px = plot[0] + (result.centers[:, 0] - xmin) * kx
+    py = plot[3] - (result.centers[:, 1] - ymin) * ky
+    sx, sy = result.hex_size
+    return px, py, sx * kx, -sy * ky
+
+
+def _draw_layer(size, px, py, hx, hy, fills):
+    layer = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    for i in np.flatnonzero([f is not None for f in fills]):
+        draw.polygon(_hexagon(px[i], py[i], hx, hy), fill=fills[i])
+    return layer
+
+
+def _to_png(img, optimize=False):
+    out = io.BytesIO()
+    img.convert("RGB").save(out, "PNG", optimize=optimize)
+    return out.getvalue()
+
+
+def render_hexbin_png(result, var1, var2, optimize=False):
+    """Non-defaulters in blue, defaulters in red on top; opacity follows log(count)."""
+    img, plot = _canvas(result, var1, var2)
+    px, py, hx, hy = _to_pixels(result, plot)
+    for counts, rgb in ((result.non_defaulters, NON_DEFAULTER_RGB), (result.defaulters, DEFAULTER_RGB)):
+        peak = np.log1p(counts.max()) or 1.0
+        alpha = (30 + 150 * np.log1p(counts) / peak).astype(int)
+        fills = [rgb + (int(a),) if c else None for c, a in zip(counts, alpha)]
+        img = Image.alpha_composite(img, _draw_layer(img.size, px, py, hx, hy, fills))
+    return _to_png(img, optimize)
+
+
+def render_ratio_png(result, var1, var2, optimize=False):
+    """Share of defaulters per hex, green (low) to red (high)."""
+    img, plot = _canvas(result, var1, var2)
+    px, py, hx, hy = _to_pixels(result, plot)
+    ratio = result.ratio
+    finite = ratio[np.isfinite(ratio)]
+    top = finite.max() if finite.size and finite.max() > 0 else 1.0
+    fills = []
+    for r in ratio:
+        if not np.isfinite(r):
+            fills.append(None)
+            continue
+        t = min(1.0, r / top)
+        fills.append(tuple(int(lo + (hi - lo) * t) for lo, hi in zip(RATIO_LOW_RGB, RATIO_HIGH_RGB)) + (230,))
+    img = Image.alpha_composite(img, _draw_layer(img.size, px, py, hx, hy, fills))
+    return _to_png(img, optimize)
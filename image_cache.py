@@ -0,0 +1,188 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from metrics import CACHE_BYTES, CACHE_LOOKUPS
+from mirror import write_atomic
+
+# ==========================================
+# CHART IMAGE CACHE
+# ==========================================
+# Two tiers:
+#   1. Memory  - LRU, bounded by a byte budget, shared by every session.
+#   2. Disk    - one file per image, survives process restarts.
+# Keys are (drive_file_id, version) where version is the Drive md5Checksum
+# (or modifiedTime when no checksum is available), so a re-uploaded chart
+# never serves the old bytes.
+# Instead of its own disk tier, a cache can be backed by a SharedCache
+# (shared_cache.py), so replicas on one host download each chart once.
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024   # 256 MB
+DEFAULT_DISK_BUDGET = 2 * 1024 * 1024 * 1024  # 2 GB
+
+# Once over budget, a disk tier is trimmed down to this share of it, so
+# the directory isn't rescanned on every write.
+TRIM_TARGET = 0.9
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def trim_lru(directory, budget, suffix="", keep=None, target=TRIM_TARGET):
+    """
+    Removes the least recently used files (oldest mtime) ending in suffix
+    until they fit in target * budget. Does nothing while the total is
+    within budget. Returns the bytes left.
+    """
+    try:
+        entries = []
+        total = 0
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(suffix) or entry.name.endswith(".tmp"): continue
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path, entry.name))
+            total += st.st_size
+    except OSError:
+        return 0
+    if total <= budget: return total
+    entries.sort()
+    for _, size, path, name in entries:
+        if total <= budget * target: break
+        if name == keep: continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            continue
+    return total
+
+
+class ImageCache:
+    def __init__(self, disk_dir=None, memory_budget=DEFAULT_MEMORY_BUDGET, disk_budget=DEFAULT_DISK_BUDGET, name="images", backing=None):
+        self.name = name  # label in the metrics
+        self.backing = backing
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._disk_used = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_used = trim_lru(self.disk_dir, self.disk_budget, ".img")
+
+    # --- KEYS ---
+
+    @staticmethod
+    def make_key(file_id, version=None):
+        return (file_id, version or "")
+
+    def _disk_path(self, key):
+        file_id, version = key
+        name = _UNSAFE_CHARS.sub("_", f"{file_id}-{version}")
+        return os.path.join(self.disk_dir, name + ".img")
+
+    # --- MEMORY TIER ---
+
+    def _remember(self, key, data):
+        """Inserts into the LRU and evicts the oldest entries over budget."""
+        size = len(data)
+        if size > self.memory_budget:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._memory_used -= len(old)
+            self._entries[key] = data
+            self._memory_used += size
+            while self._memory_used > self.memory_budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_used -= len(evicted)
+            CACHE_BYTES.set(self._memory_used, cache=self.name)
+
+    # --- DISK TIER ---
+
+    def _read_disk(self, key):
+        if not self.disk_dir: return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # keeps disk eviction least-recently-used
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.disk_dir: return
+        # Written to a temp file first so readers never see half an image.
+        try:
+            write_atomic(self._disk_path(key), data)
+        except OSError:
+            return
+        # Running total (a rewrite is counted twice until the next trim rescans).
+        with self._lock:
+            self._disk_used += len(data)
+            over = self._disk_used > self.disk_budget
+        if over:
+            used = trim_lru(self.disk_dir, self.disk_budget, ".img")
+            with self._lock:
+                self._disk_used = used
+
+    # --- PUBLIC API ---
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(cache=self.name, result="memory")
+                return data
+
+        data = self._read_disk(key)
+        if data is not None:
+            self.disk_hits += 1
+            CACHE_LOOKUPS.inc(cache=self.name, result="disk")
+            self._remember(key, data)
+            return data
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+        return None
+
+    def put(self, key, data):
+        data = bytes(data)
+        self._remember(key, data)
+        self._write_disk(key, data)
+
+    def get_or_load(self, key, loader):
+        """Returns cached bytes for key, calling loader() and storing the result on a miss."""
+        data = self.get(key)
+        if data is not None: return data
+        if self.backing is not None:
+            file_id, version = key
+            data = self.backing.get_or_load(f"{self.name}/{file_id}/{version}", loader)
+            if data is not None:
+                self._remember(key, bytes(data))
+            return data
+        data = loader()
+        if data is not None:
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_used": self._memory_used,
+                "memory_budget": self.memory_budget,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
@@ -1,173 +1,461 @@
 import streamlit as st
-import base64
-import io
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import config
+from aggregate_cube import AggregateCube, build_cube, cube_chart, cube_filename
+from chart_index import ChartIndex, chart_filename
+from chart_viewer import chart_grid, chart_viewer
+from folder_listing import FolderListing
+from hexbin_engine import HexbinEngine
+from image_cache import ImageCache
+from media import ChartPublisher
+from metrics import APP_ERRORS, APP_STEP, REGISTRY, start_http_server
+from prefetch import Prefetcher, neighbours
+from renditions import RenditionPipeline
+from revalidate import StaleWhileRevalidate
+from shared_cache import SharedCache
+from storage import create_storage, warm_up as warm_up_storage
 
 # --- PAGE CONFIG (Must be first) ---
 st.set_page_config(page_title="Data Palette", layout="wide")
 
-# ==========================================
-# GOOGLE DRIVE CONFIGURATION
-# ==========================================
-# 1. Open the folder/file in Google Drive.
-# 2. Look at the URL. 
-#    Folder: .../drive/folders/YOUR_ID_HERE
-#    File: .../file/d/YOUR_ID_HERE/view
-
-DRIVE_FOLDER_ID_HEXBIN = "1Jo8J3dCrfFlCWBpuA6S6LuSBEZlYWQiz"
-DRIVE_FOLDER_ID_RATIO = "1OJEmNqsypkt2zSNn7GFM_TB0bHOtnxwA"
-FILE_ID_NAMES_TXT = "1absVXCyBftpjuYQYY9yWDOBD55REXJHb"
-FILE_ID_NAMES2_TXT = "1ISKIsGYcA9uV0Xd5eAaScHW5e_0zW38r"
+# Drive folder/file ids, the corpora and the storage backend choice live in config.py.
 
 # ==========================================
-# GOOGLE DRIVE API FUNCTIONS
+# STORAGE FUNCTIONS (Drive or local mirror)
 # ==========================================
 
 @st.cache_resource
-def get_drive_service():
-    """Authenticates using Streamlit secrets."""
+def get_storage():
+    """Builds the configured storage backend (Drive authenticates using Streamlit secrets)."""
     try:
-        creds = service_account.Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=['https://www.googleapis.com/auth/drive.readonly']
-        )
-        return build('drive', 'v3', credentials=creds)
+        if config.STORAGE_BACKEND == "drive":
+            return create_storage("drive", service_account_info=st.secrets["gcp_service_account"], pool_size=config.DRIVE_POOL_SIZE)
+        return create_storage(config.STORAGE_BACKEND, local_root=config.LOCAL_STORAGE_ROOT, pool_size=config.DRIVE_POOL_SIZE)
     except Exception as e:
+        APP_ERRORS.inc(step="auth")
         st.error(f"Authentication Error: Please check .streamlit/secrets.toml. {e}")
         return None
 
-@st.cache_data(ttl=3600)
+@st.cache_resource
+def get_shared_cache():
+    """Disk cache shared with the other replicas on this host."""
+    return SharedCache(config.SHARED_CACHE_DIR, budget=config.IMAGE_CACHE_DISK_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_folder_listing(folder_id):
+    """Incrementally maintained listing of one folder (see folder_listing.py)."""
+    storage = get_storage()
+    if not storage: return None
+    return FolderListing(storage, folder_id, state_path=os.path.join(config.CACHE_DIR, "listings", f"{folder_id}.json"),
+                         full_relist_interval=config.FULL_RELIST_INTERVAL)
+
+@st.cache_resource
+def get_listing_source(folder_id):
+    """
+    Serves the last good {"files": {...}, "version": ...} of one folder and
+    revalidates it in the background every LISTING_REFRESH_INTERVAL seconds
+    (see revalidate.py). A refresh goes through the Drive changes feed, so
+    it only transfers what changed; with several replicas, one of them
+    refreshes and the others read its result from the shared cache.
+    The listing saved on disk is served from the start, so only a brand
+    new replica waits for a full folder listing.
+    """
+    listing = get_folder_listing(folder_id)
+    if not listing: return None
+    shared = get_shared_cache() if listing.storage.cacheable else None
+
+    def refresh():
+        listing.refresh()
+        return {"files": listing.files, "version": listing.version}
+
+    def load(previous):
+        if shared is None: return refresh()
+        return shared.get_or_load_json(f"folder/{folder_id}", refresh, max_age=config.LISTING_REFRESH_INTERVAL)
+
+    saved = {"files": listing.files, "version": listing.version} if listing.files and listing.version else None
+    return StaleWhileRevalidate(load, config.LISTING_REFRESH_INTERVAL, name=f"folder/{folder_id}", initial=saved)
+
+def get_listing_snapshot(folder_id):
+    """{"files": {...}, "version": ...} for one folder; raises only if it was never listed."""
+    source = get_listing_source(folder_id)
+    return source.get() if source else None
+
 def get_drive_file_map(folder_id):
     """
-    Returns a dictionary {filename: file_id} for all files in a folder.
-    Cached for 1 hour to speed up the app.
+    Returns a dictionary {filename: {id, md5Checksum, modifiedTime, size}}
+    for all files in a folder.
     """
-    service = get_drive_service()
-    if not service: return {}
-    
-    files_dict = {}
-    page_token = None
-    
     try:
-        while True:
-            results = service.files().list(
-                q=f"'{folder_id}' in parents and trashed=false",
-                fields="nextPageToken, files(id, name)",
-                pageToken=page_token
-            ).execute()
-            
-            items = results.get('files', [])
-            for item in items:
-                files_dict[item['name']] = item['id']
-                
-            page_token = results.get('nextPageToken')
-            if not page_token:
-                break
-        return files_dict
+        snapshot = get_listing_snapshot(folder_id)
     except Exception as e:
+        APP_ERRORS.inc(step="list_folder")
         st.error(f"Error listing files from Drive: {e}")
         return {}
+    return snapshot["files"] if snapshot else {}
 
-@st.cache_data(ttl=3600)
-def read_txt_from_drive(file_id):
-    """Downloads a text file and returns a list of lines."""
-    service = get_drive_service()
-    if not service: return []
-    
+@st.cache_resource
+def get_manifest_source(file_id):
+    """
+    Serves the last good {"version": ..., "lines": [...]} of a text file
+    (names.txt). Every REVALIDATE_INTERVAL seconds its Drive metadata is
+    checked in the background; the file is downloaded again only when
+    its checksum changed.
+    """
+    storage = get_storage()
+    if not storage: return None
+    shared = get_shared_cache() if storage.cacheable else None
+
+    def load(previous):
+        version = file_version(storage.stat(file_id))
+        if previous is not None and previous["version"] == version:
+            return previous
+        with APP_STEP.time(step="read_text"):
+            if shared is None:
+                data = storage.read_bytes(file_id)
+            else:
+                data = shared.get_or_load(f"text/{file_id}/{version}", lambda: storage.read_bytes(file_id))
+        return {"version": version, "lines": bytes(data).decode("utf-8").splitlines()}
+
+    return StaleWhileRevalidate(load, config.REVALIDATE_INTERVAL, name=f"text/{file_id}")
+
+def get_manifest(file_id):
+    """{"version": ..., "lines": [...]} for a text file; raises only if it was never read."""
+    source = get_manifest_source(file_id)
+    return source.get() if source else None
+
+@st.cache_resource
+def get_image_cache():
+    """One in-memory image cache per process, backed by the cache shared between replicas."""
+    return ImageCache(memory_budget=config.IMAGE_CACHE_MEMORY_MB * 1024 * 1024, backing=get_shared_cache())
+
+@st.cache_resource
+def get_chart_publisher():
+    return ChartPublisher(config.STATIC_DIR, budget=config.STATIC_CHARTS_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher(workers=config.PREFETCH_WORKERS)
+
+def file_version(meta):
+    """The value that changes whenever the file content does."""
+    return meta["md5Checksum"] or meta["modifiedTime"]
+
+def content_key(meta):
+    """
+    Image cache key for a chart's bytes. Byte-identical charts (thresholds
+    that drop no extra rows, var1 == var2 diagonals) share an md5Checksum,
+    so they are downloaded, cached and encoded once whichever file is
+    asked for. Falls back to the file itself when there is no checksum.
+    """
+    if meta.get("md5Checksum"):
+        return ImageCache.make_key(f"md5:{meta['md5Checksum']}", meta["md5Checksum"])
+    return ImageCache.make_key(meta["id"], file_version(meta))
+
+def load_image_bytes(storage, cache, file_id, key):
+    """Reads file_id through the image cache under key. Safe to call from background threads."""
+    if storage.cacheable:
+        return cache.get_or_load(key, lambda: storage.read_bytes(file_id))
+    return storage.read_bytes(file_id)
+
+@st.cache_resource
+def get_rendition_pipeline():
+    """WebP renditions, cached on disk by source checksum (see renditions.py)."""
+    cache = ImageCache(
+        disk_dir=os.path.join(config.CACHE_DIR, "renditions"),
+        memory_budget=config.IMAGE_CACHE_MEMORY_MB * 1024 * 1024 // 4,
+        disk_budget=config.IMAGE_CACHE_DISK_MB * 1024 * 1024,
+        name="renditions",
+    )
+    return RenditionPipeline(cache, get_chart_publisher())
+
+def publish_chart(storage, cache, pipeline, meta):
+    """Publishes a chart and its renditions; returns their URLs. Thread-safe."""
+    key = content_key(meta)
+    return pipeline.publish(*key, lambda: load_image_bytes(storage, cache, meta["id"], key))
+
+@st.cache_resource
+def get_fetch_pool():
+    """Threads used to fetch the charts a page needs right now, in parallel."""
+    return ThreadPoolExecutor(max_workers=config.DRIVE_POOL_SIZE, thread_name_prefix="fetch")
+
+def fetch_frames(jobs):
+    """Runs [(bin, job), ...] concurrently; returns [(bin, urls), ...] for the chart viewer."""
+    pool = get_fetch_pool()
+    with APP_STEP.time(step="fetch_frames"):
+        # A job listed under several bins (identical charts) runs once.
+        submitted = {}
+        futures = []
+        for b, job in jobs:
+            if job not in submitted:
+                submitted[job] = pool.submit(job)
+            futures.append((b, submitted[job]))
+        frames = []
+        for b, future in futures:
+            try:
+                urls = future.result()
+            except Exception as e:
+                APP_ERRORS.inc(step="fetch_frames")
+                st.error(f"Error downloading image: {e}")
+                continue
+            if urls["png"]:
+                frames.append((b, urls))
+    return frames
+
+def get_chart_frames(index, var1, var2, filt):
+    """Publishes every bin threshold of one pre-rendered combination concurrently."""
+    storage = get_storage()
+    if not storage: return []
+    cache = get_image_cache()
+    pipeline = get_rendition_pipeline()
+    jobs = {}
+    frames = []
+    for b in index.bins(var1, var2, filt):
+        meta = index.lookup(var1, var2, filt, b)
+        key = content_key(meta)
+        if key not in jobs:
+            jobs[key] = lambda meta=meta: publish_chart(storage, cache, pipeline, meta)
+        frames.append((b, jobs[key]))
+    return fetch_frames(frames)
+
+# ==========================================
+# LIVE RENDERING (optional, see hexbin_engine.py)
+# ==========================================
+
+@st.cache_resource
+def get_hexbin_engine():
+    """Loads the applicant table once; None when DATA_PALETTE_DATASET isn't set."""
+    if not config.DATASET_PATH: return None
     try:
-        request = service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-        
-        content = fh.getvalue().decode('utf-8')
-        return content.splitlines()
+        return HexbinEngine(config.DATASET_PATH, target=config.DATASET_TARGET, gridsize=config.HEXBIN_GRIDSIZE, variables=config.LIVE_VARIABLES)
     except Exception as e:
-        st.error(f"Error reading text file: {e}")
-        return []
+        st.error(f"Error loading dataset for live rendering: {e}")
+        return None
 
-def get_image_base64_from_drive(file_id):
-    """Downloads an image into memory and returns base64 string."""
-    service = get_drive_service()
-    if not service: return None
-    
+def live_chart_id(var1, var2, filt, bin_val, ratio=False):
+    return f"live:{var1}:{var2}:{filt}:{bin_val}:{'ratio' if ratio else 'hexbin'}"
+
+def get_live_frames(engine, var1, var2, filt, ratio=False):
+    """Renders (or reuses) every bin threshold of one combination concurrently."""
+    pipeline = get_rendition_pipeline()
+    def job(b):
+        return pipeline.publish(live_chart_id(var1, var2, filt, b, ratio), engine.version, lambda: engine.render(var1, var2, filt, b, ratio=ratio))
+    return fetch_frames([(b, lambda b=b: job(b)) for b in engine.bins(var1, var2, filt)])
+
+# ==========================================
+# SMALL MULTIPLES (grid view)
+# ==========================================
+
+GRID_MODES = ["Single chart", "All thresholds", "All filters"]
+
+def grid_cells(charts, mode, var1, var2, filt, bin_val):
+    """[(label, filter, bin)] shown by the grid view."""
+    if mode == "All thresholds":
+        return [(f"Bin ≥ {b}", filt, b) for b in charts.bins(var1, var2, filt)]
+    return [(format_label(f), f, bin_val) for f in charts.filter_options(var1, var2) if bin_val in charts.bins(var1, var2, f)]
+
+def get_grid_thumbnails(charts, live, var1, var2, cells, ratio=False):
+    """Publishes the thumbnails for [(label, filter, bin)] concurrently; returns [(label, urls)]."""
+    pipeline = get_rendition_pipeline()
+    if live:
+        def job(filt, b):
+            return pipeline.thumbnail(live_chart_id(var1, var2, filt, b, ratio), charts.version, lambda: charts.render(var1, var2, filt, b, ratio=ratio))
+        return fetch_frames([(label, lambda f=f, b=b: job(f, b)) for label, f, b in cells])
+
+    storage = get_storage()
+    if not storage: return []
+    cache = get_image_cache()
+    jobs = {}
+    frames = []
+    for label, f, b in cells:
+        meta = charts.lookup(var1, var2, f, b)
+        key = content_key(meta)
+        if key not in jobs:
+            jobs[key] = lambda meta=meta, key=key: pipeline.thumbnail(*key, lambda: load_image_bytes(storage, cache, meta["id"], key))
+        frames.append((label, jobs[key]))
+    return fetch_frames(frames)
+
+# ==========================================
+# AGGREGATE CUBES (interactive charts, see aggregate_cube.py)
+# ==========================================
+
+@st.cache_resource(max_entries=64)
+def load_cube(file_id, version):
+    storage = get_storage()
+    return AggregateCube.from_bytes(load_image_bytes(storage, get_image_cache(), file_id, ImageCache.make_key(file_id, version)))
+
+@st.cache_resource(max_entries=64)
+def build_live_cube(var1, var2, version):
+    # `version` (the dataset's) is only part of the cache key.
+    return build_cube(get_hexbin_engine(), var1, var2)
+
+def get_cube(var1, var2, live=False):
+    """
+    The aggregate cube for a pair: built from the dataset in live mode,
+    otherwise read from the cube folder. None when there isn't one.
+    """
+    if live: return build_live_cube(var1, var2, get_hexbin_engine().version)
+    if not config.DRIVE_FOLDER_ID_CUBES or not get_storage(): return None
+
+    meta = get_drive_file_map(config.DRIVE_FOLDER_ID_CUBES).get(cube_filename(var1, var2))
+    if not meta: return None
     try:
-        request = service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-        
-        return base64.b64encode(fh.getvalue()).decode()
+        return load_cube(meta["id"], file_version(meta))
     except Exception as e:
-        st.error(f"Error downloading image: {e}")
+        APP_ERRORS.inc(step="load_cube")
+        st.error(f"Error loading aggregate cube: {e}")
         return None
 
+def prefetch_charts(metas):
+    """Warms the cache and static folder for the given charts in the background."""
+    storage = get_storage()
+    if not storage: return
+    # Resolve the cached resources here: jobs run outside the script thread.
+    cache = get_image_cache()
+    pipeline = get_rendition_pipeline()
+
+    jobs = []
+    for meta in metas:
+        jobs.append((content_key(meta), lambda meta=meta: publish_chart(storage, cache, pipeline, meta)))
+
+    if "prefetch_session" not in st.session_state:
+        st.session_state.prefetch_session = uuid.uuid4().hex
+    get_prefetcher().schedule(st.session_state.prefetch_session, jobs)
+
+def prefetch_neighbours(index, var1, var2, filt):
+    """
+    Queues every bin of the adjacent filter variables in the dropdown
+    (or of all of them with DATA_PALETTE_PREFETCH_FILTERS=1).
+    """
+    limit = None if config.PREFETCH_FILTERS else 2
+    metas = []
+    for f in neighbours(index.filter_options(var1, var2), filt, limit):
+        metas += [index.lookup(var1, var2, f, b) for b in index.bins(var1, var2, f)]
+    prefetch_charts(metas)
+
 # ==========================================
-# ORIGINAL HELPER FUNCTIONS (Refactored for Drive)
+# CHART INDEX (names.txt joined with the folder listing)
 # ==========================================
 
-@st.cache_data
-def load_data_structure_drive(file_id):
-    data_map = {}
-    lines = read_txt_from_drive(file_id)
-    
-    if not lines: return None
-    
-    for line in lines:
-        filename = line.strip()
-        if not filename.endswith(".png"): continue
-        try:
-            # Parse assuming single underscore delimiters first
-            parts = filename.split("_filter")
-            vars_main = parts[0].split("vs")
-            
-            # STRIP underscores to get clean names (The Fix)
-            var1 = vars_main[0].strip("_") 
-            var2 = vars_main[1].strip("_")
-            
-            filter_part = parts[1] # e.g. "_df1_INCOME_bin_ge_0"
-            filter_var = filter_part.split("_bin_ge")[0].strip("_")
-
-            if var1 not in data_map: data_map[var1] = {}
-            if var2 not in data_map[var1]: data_map[var1][var2] = []
-            if filter_var not in data_map[var1][var2]: data_map[var1][var2].append(filter_var)
-        except: continue
-    return data_map
+def index_path(corpus):
+    return os.path.join(config.CACHE_DIR, "index", f"{corpus}.json.gz")
+
+class SourceUnavailable(Exception):
+    pass
+
+@st.cache_resource(max_entries=4)
+def build_chart_index(corpus, manifest_version, listing_version, _lines, _file_map):
+    """
+    The ChartIndex for one version of a corpus' manifest and folder listing
+    (the versions identify _lines and _file_map, which aren't hashed).
+    The saved index is reused when it was built from the same versions.
+    """
+    source = f"{manifest_version}:{listing_version}"
+    path = index_path(corpus)
+    saved = ChartIndex.load(path)
+    if saved is not None and saved.fingerprint == source: return saved
+
+    index = ChartIndex.build(_lines, _file_map, source_version=source)
+    try:
+        index.save(path)
+    except OSError:
+        pass
+    return index
+
+def get_chart_index(corpus):
+    """
+    Returns the ChartIndex for a corpus ("hexbin" or "ratio"), rebuilt
+    only when names.txt or the folder listing actually changed.
+    If Drive is unavailable the last saved index is used; None if there
+    is none.
+    """
+    spec = config.CORPORA[corpus]
+    try:
+        manifest = get_manifest(spec["manifest"])
+        snapshot = get_listing_snapshot(spec["folder"])
+        if not manifest or not manifest["lines"] or not snapshot or not snapshot["files"]:
+            # Not cached: the next rerun tries again.
+            raise SourceUnavailable(corpus)
+        return build_chart_index(corpus, manifest["version"], snapshot["version"], manifest["lines"], snapshot["files"])
+    except Exception:
+        # Drive unavailable: an old index is better than nothing.
+        APP_ERRORS.inc(step="chart_index")
+        return ChartIndex.load(index_path(corpus))
 
 # ==========================================
-# MAPPING DICTIONARY
+# METRICS (see metrics.py)
 # ==========================================
 
-VARIABLE_MAPPINGS = {
-"df1_AMT_ANNUITY": "Loan Annuity",
-"df1_AMT_CREDIT": "Credit Amount",
-"df1_AMT_INCOME_TOTAL": "Total Income",
-"df1_AMT_REQ_CREDIT_BUREAU_MON": "Credit Bureau Enquiries (Monthly)",
-"df1_APARTMENTS_AVG": "Average Apartment Size",
-"df1_DAYS_BIRTH": "Age (Days)",
-"df1_DAYS_EMPLOYED": "Days Employed",
-"df1_DAYS_LAST_PHONE_CHANGE": "Days Since Last Phone Change",
-"df1_DAYS_REGISTRATION": "Registration Days",
-"df1_CODE_GENDER": "Gender",
-"df1_FLAG_OWN_CAR": "Car Ownership",
-"df1_FLAG_OWN_REALTY": "Realty Ownership",
-"df1_CNT_CHILDREN": "Child Count",
-"df1_NAME_EDUCATION_TYPE": "Education Level",
-"df1_NAME_FAMILY_STATUS": "Family Status",
-"df1_NAME_HOUSING_TYPE": "Housing Type",
-"df1_NAME_INCOME_TYPE": "Income Type",
-"df1_OCCUPATION_TYPE": "Occupation",
-"df1_ORGANIZATION_TYPE": "Organization Type",
-"df1_EXT_SOURCE_1": "External Source 1",
-"df1_EXT_SOURCE_2": "External Source 2",
-"df1_EXT_SOURCE_3": "External Source 3"
-}
+@st.cache_resource
+def start_metrics_server():
+    """Prometheus endpoint on DATA_PALETTE_METRICS_PORT, started once per process."""
+    if not config.METRICS_PORT: return None
+    try:
+        return start_http_server(config.METRICS_PORT)
+    except OSError as e:
+        # Another replica on this host already has the port.
+        st.warning(f"Metrics endpoint not started: {e}")
+        return None
+
+@st.cache_resource
+def start_warm_up():
+    """
+    Once per process, after the first page is out: imports the Drive client
+    and the charting libraries in the background, so the first dashboard
+    visit doesn't wait for them either.
+    """
+    def run():
+        try:
+            if config.STORAGE_BACKEND == "drive":
+                warm_up_storage()
+            import altair, pandas
+        except Exception:
+            pass  # Only an optimization; the page imports them itself if needed.
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def debug_panel():
+    """Sidebar summary of the process-wide metrics and cache state."""
+    with st.sidebar.expander("Debug: metrics"):
+        timings, counters = [], []
+        for metric in REGISTRY.metrics():
+            if metric.kind == "histogram":
+                for key, (n, mean, p95) in sorted(metric.summary().items()):
+                    timings.append({"metric": metric.name, "labels": "/".join(key), "count": n, "mean ms": round(mean * 1000, 1), "p95 ms": "> 10000" if p95 == float("inf") else round(p95 * 1000)})
+            else:
+                for _, labels, value in metric.samples():
+                    counters.append({"metric": metric.name, "labels": "/".join(labels.values()), "value": value})
+        st.caption("Timings (p95 is a bucket bound)")
+        st.dataframe(timings, hide_index=True)
+        st.caption("Counters and gauges")
+        st.dataframe(counters, hide_index=True)
+        st.caption("Caches and pools")
+        storage = get_storage()
+        st.json({
+            "images": get_image_cache().stats(),
+            "renditions": get_rendition_pipeline().cache.stats(),
+            "shared": get_shared_cache().stats(),
+            "prefetch": get_prefetcher().stats(),
+            "drive_pool": storage.http_pool.stats() if getattr(storage, "http_pool", None) else None,
+        }, expanded=False)
+        st.caption("Listings and manifests (served stale, revalidated in the background)")
+        sources = {}
+        for corpus, spec in config.CORPORA.items():
+            listing, manifest = get_listing_source(spec["folder"]), get_manifest_source(spec["manifest"])
+            sources[corpus] = {
+                "listing": listing.stats() if listing else None,
+                "manifest": manifest.stats() if manifest else None,
+            }
+        st.json(sources, expanded=False)
+        st.caption("Duplicate charts (stored once)")
+        reports = {}
+        for corpus in config.CORPORA:
+            index = get_chart_index(corpus)
+            if index: reports[corpus] = index.dedup_report()
+        st.json(reports, expanded=False)
 
 # ==========================================
 # CUSTOM CSS
@@ -373,14 +661,14 @@ st.markdown("""
 
 def format_label(label):
     """
-    1. Checks if label is in VARIABLE_MAPPINGS.
+    1. Checks if label is in config.VARIABLE_MAPPINGS.
     2. If not, removes 'df1_' and replaces '_' with space.
     """
     if not label: return ""
     
     # Check specific mapping
-    if label in VARIABLE_MAPPINGS:
-        return VARIABLE_MAPPINGS[label]
+    if label in config.VARIABLE_MAPPINGS:
+        return config.VARIABLE_MAPPINGS[label]
         
     # Generic fallback
     return label.replace("df1_", "").replace("_", " ").title()
@@ -445,6 +733,31 @@ def page_problem_statement():
     st.success("Final Goal: Empower the credit team to make cleaner, data-driven decisions.")
 
 def page_dashboard():
+    # 1. Load the chart index (names.txt + Hexbin folder, cached)
+    index = get_chart_index("hexbin")
+
+    if index is None:
+        st.error(f"❌ Error: Could not load 'names.txt' from Google Drive.")
+    elif not index:
+        st.error(f"❌ Error: 'names.txt' was found but could not parse data.")
+    else:
+        engine = get_hexbin_engine()
+        live = False
+        if engine is not None:
+            with st.sidebar:
+                st.header("Graph Controls")
+                live = st.toggle("Live rendering", help="Render any combination from the dataset instead of the pre-rendered charts.")
+        dashboard_chart_area(engine, live)
+
+# The chart areas below are fragments: changing a selector reruns only the
+# fragment (controls, heading and chart), not the page config, the CSS,
+# the sidebar or the page-level checks. Fragments can't write to the
+# sidebar, so their controls sit above the chart. A fragment rerun reuses
+# the arguments of the last full run, so the chart index is looked up
+# inside (cheap) to pick up revalidated manifests and listings.
+
+@st.fragment
+def dashboard_chart_area(engine, live):
     # --- INSIGHTS DICTIONARY ---
     attribute_descriptions = {
         "df1_AMT_ANNUITY": "It is generally observed that individuals who tend to pay higher annuity, tend to default less frequently.",
@@ -458,115 +771,149 @@ def page_dashboard():
         "df1_DAYS_REGISTRATION": "It is generally observed that individuals who have changed their registrations long before applying for a loan, tend to default less frequently."
     }
 
-    # 1. Load Data Structure from DRIVE
-    data_map = load_data_structure_drive(FILE_ID_NAMES_TXT)
-    
-    # 2. Pre-fetch file list from Hexbin Folder (Cached)
-    image_files_map = get_drive_file_map(DRIVE_FOLDER_ID_HEXBIN)
-
-    if data_map is None:
+    index = get_chart_index("hexbin")
+    if not index:
         st.error(f"❌ Error: Could not load 'names.txt' from Google Drive.")
-    elif not data_map:
-        st.error(f"❌ Error: 'names.txt' was found but could not parse data.")
+        return
+    charts = engine if live else index
+
+    # --- PAGE 1 CONTROLS (only combinations that exist) ---
+    c1, c2, c3 = st.columns(3)
+    var1 = c1.selectbox("X-Axis Variable", charts.var1_options(), format_func=format_label)
+    var2 = c2.selectbox("Y-Axis Variable", charts.var2_options(var1), format_func=format_label)
+    filt = c3.selectbox("Filter Variable", charts.filter_options(var1, var2), format_func=format_label)
+    # The Bin Threshold slider lives in the chart viewer (no rerun per step).
+    c1, c2, c3 = st.columns(3)
+    view = c1.radio("View", GRID_MODES, horizontal=True, help="Compare every threshold or filter side by side; click a chart to enlarge it.")
+    grid_bin = c2.select_slider("Bin Threshold", charts.bins(var1, var2, filt), key="bin") if view == "All filters" else None
+    interactive = view == "Single chart" and (live or bool(config.DRIVE_FOLDER_ID_CUBES)) and c3.toggle("Interactive chart", help="Zoom, pan and hover for counts.")
+    cube = get_cube(var1, var2, live) if interactive else None
+
+    # Display Heading
+    dy = format_label(var1)
+    dx = format_label(var2)
+    
+    st.markdown(f'''
+        <div class="axis-subheading">
+            <span>{dy}</span> 
+            <span class="vs-tag">vs</span> 
+            <span>{dx}</span>
+        </div>
+    ''', unsafe_allow_html=True)
+
+    # --- LEGEND ---
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("""<div style="text-align: center; margin-bottom: 5px;"><span style="background-color: #e3f2fd; padding: 4px 15px; border-radius: 12px; border: 1px solid #90caf9; color: #1565c0; font-size: 14px;">● <b>Non-Defaulters</b> (Blue)</span></div>""", unsafe_allow_html=True)
+    with c2:
+        st.markdown("""<div style="text-align: center; margin-bottom: 5px;"><span style="background-color: #ffebee; padding: 4px 15px; border-radius: 12px; border: 1px solid #ef9a9a; color: #c62828; font-size: 14px;">● <b>Loan Defaulters</b> (Red)</span></div>""", unsafe_allow_html=True)
+
+    if view != "Single chart":
+        # Thumbnails fetched in parallel; click one to see it full size
+        cells = get_grid_thumbnails(charts, live, var1, var2, grid_cells(charts, view, var1, var2, filt, grid_bin))
+        found = bool(cells)
+        if cells:
+            chart_grid(cells, "fade-in-image")
+    elif cube is not None and cube.has_filter(filt):
+        # Drawn from the counts; the Bin Threshold slider is part of the chart
+        st.altair_chart(cube_chart(cube, filt, x_title=dy, y_title=dx), width="stretch")
+        found = True
     else:
-        with st.sidebar:
-            st.header("Graph Controls")
-            
-            # --- PAGE 1 DROPDOWNS ---
-            var1 = st.selectbox("X-Axis Variable", sorted(list(data_map.keys())), format_func=format_label)
-            var2 = st.selectbox("Y-Axis Variable", sorted(list(data_map[var1].keys())), format_func=format_label)
-            filt = st.selectbox("Filter Variable", sorted(data_map[var1][var2]), format_func=format_label)
-            bin_val = st.slider("Bin Threshold", 0, 9, 0)
-
-        # Display Heading
-        dy = format_label(var1)
-        dx = format_label(var2)
-        
-        st.markdown(f'''
-            <div class="axis-subheading">
-                <span>{dy}</span> 
-                <span class="vs-tag">vs</span> 
-                <span>{dx}</span>
-            </div>
-        ''', unsafe_allow_html=True)
-
-        # --- LEGEND ---
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("""<div style="text-align: center; margin-bottom: 5px;"><span style="background-color: #e3f2fd; padding: 4px 15px; border-radius: 12px; border: 1px solid #90caf9; color: #1565c0; font-size: 14px;">● <b>Non-Defaulters</b> (Blue)</span></div>""", unsafe_allow_html=True)
-        with c2:
-            st.markdown("""<div style="text-align: center; margin-bottom: 5px;"><span style="background-color: #ffebee; padding: 4px 15px; border-radius: 12px; border: 1px solid #ef9a9a; color: #c62828; font-size: 14px;">● <b>Loan Defaulters</b> (Red)</span></div>""", unsafe_allow_html=True)
-
-        filename = f"{var1}_vs_{var2}__filter_{filt}_bin_ge_{bin_val}.png"
-        
-        
-        # Check if file exists in our Drive Map
-        if filename in image_files_map:
-            # Fetch the actual image using ID
-            img_id = image_files_map[filename]
-            img_str = get_image_base64_from_drive(img_id)
-            
-            if img_str:
-                st.markdown(f'<img src="data:image/png;base64,{img_str}" class="fade-in-image">', unsafe_allow_html=True)
-            
-            # --- ATTRIBUTE INTUITION ---
-            has_v1_info = var1 in attribute_descriptions
-            has_v2_info = var2 in attribute_descriptions
-
-            if has_v1_info or has_v2_info:
-                st.markdown("### Attribute Intuition")
-                if has_v1_info:
-                    st.info(f"**{format_label(var1)}**: {attribute_descriptions[var1]}")
-                if has_v2_info and var1 != var2:
-                    st.info(f"**{format_label(var2)}**: {attribute_descriptions[var2]}")
+        # Fetch every bin threshold at once; the viewer switches between them
+        frames = get_live_frames(engine, var1, var2, filt) if live else get_chart_frames(index, var1, var2, filt)
+        found = bool(frames)
+        if frames:
+            chart_viewer(frames, "fade-in-image", sizes="100vw")
+            if not live:
+                prefetch_neighbours(index, var1, var2, filt)
+    
+    if found:
+        # --- ATTRIBUTE INTUITION ---
+        has_v1_info = var1 in attribute_descriptions
+        has_v2_info = var2 in attribute_descriptions
+
+        if has_v1_info or has_v2_info:
+            st.markdown("### Attribute Intuition")
+            if has_v1_info:
+                st.info(f"**{format_label(var1)}**: {attribute_descriptions[var1]}")
+            if has_v2_info and var1 != var2:
+                st.info(f"**{format_label(var2)}**: {attribute_descriptions[var2]}")
 
-        else:
-            st.warning(f"Graph not found.")
-            st.info(f"Looking for: {filename}")
+    else:
+        st.warning(f"Graph not found.")
+        st.info(f"Looking for: {chart_filename(var1, var2, filt, 0)}")
 
 def page_ratio_dashboard():
-    # 1. Load Data Structure from DRIVE
-    data_map = load_data_structure_drive(FILE_ID_NAMES2_TXT)
-    
-    # 2. Pre-fetch file list from Ratio Folder (Cached)
-    image_files_map = get_drive_file_map(DRIVE_FOLDER_ID_RATIO)
+    # 1. Load the chart index (names2.txt + Ratio folder, cached)
+    index = get_chart_index("ratio")
 
-    if data_map is None:
+    if index is None:
         st.error(f"❌ Error: Could not load 'names2.txt' from Google Drive.")
-    elif not data_map:
+    elif not index:
         st.error(f"❌ Error: 'names2.txt' parsed no data.")
     else:
-        with st.sidebar:
-            st.header("Ratio Controls")
-            
-            # --- PAGE 2 DROPDOWNS ---
-            var1 = st.selectbox("X-Axis Variable", sorted(list(data_map.keys())), key="r_v1", format_func=format_label)
-            var2 = st.selectbox("Y-Axis Variable", sorted(list(data_map[var1].keys())), key="r_v2", format_func=format_label)
-            filt = st.selectbox("Filter Variable", sorted(data_map[var1][var2]), key="r_f", format_func=format_label)
-            bin_val = st.slider("Bin Threshold", 0, 9, 0, key="r_b")
-        
-        dy = format_label(var1)
-        dx = format_label(var2)
-        
-        st.markdown(f'''
-            <div class="axis-subheading">
-                <span>{dy}</span> 
-                <span class="vs-tag">vs</span> 
-                <span>{dx}</span>
-            </div>
-        ''', unsafe_allow_html=True)
-
-        filename = f"{var1}_vs_{var2}__filter_{filt}_bin_ge_{bin_val}_ratio.png"
-        # Check and Download
-        if filename in image_files_map:
-            img_id = image_files_map[filename]
-            img_str = get_image_base64_from_drive(img_id)
-            
-            if img_str:
-                st.markdown(f'<img src="data:image/png;base64,{img_str}" class="fade-in-image-small">', unsafe_allow_html=True)
+        engine = get_hexbin_engine()
+        live = False
+        if engine is not None:
+            with st.sidebar:
+                st.header("Ratio Controls")
+                live = st.toggle("Live rendering", key="r_live", help="Render any combination from the dataset instead of the pre-rendered charts.")
+        ratio_chart_area(engine, live)
+
+@st.fragment
+def ratio_chart_area(engine, live):
+    index = get_chart_index("ratio")
+    if not index:
+        st.error(f"❌ Error: Could not load 'names2.txt' from Google Drive.")
+        return
+    charts = engine if live else index
+
+    # --- PAGE 2 CONTROLS (only combinations that exist) ---
+    c1, c2, c3 = st.columns(3)
+    var1 = c1.selectbox("X-Axis Variable", charts.var1_options(), key="r_v1", format_func=format_label)
+    var2 = c2.selectbox("Y-Axis Variable", charts.var2_options(var1), key="r_v2", format_func=format_label)
+    filt = c3.selectbox("Filter Variable", charts.filter_options(var1, var2), key="r_f", format_func=format_label)
+    # The Bin Threshold slider lives in the chart viewer (no rerun per step).
+    c1, c2, c3 = st.columns(3)
+    view = c1.radio("View", GRID_MODES, key="r_view", horizontal=True, help="Compare every threshold or filter side by side; click a chart to enlarge it.")
+    grid_bin = c2.select_slider("Bin Threshold", charts.bins(var1, var2, filt), key="r_bin") if view == "All filters" else None
+    interactive = view == "Single chart" and (live or bool(config.DRIVE_FOLDER_ID_CUBES)) and c3.toggle("Interactive chart", key="r_interactive", help="Zoom, pan and hover for counts.")
+    cube = get_cube(var1, var2, live) if interactive else None
+    
+    dy = format_label(var1)
+    dx = format_label(var2)
+    
+    st.markdown(f'''
+        <div class="axis-subheading">
+            <span>{dy}</span> 
+            <span class="vs-tag">vs</span> 
+            <span>{dx}</span>
+        </div>
+    ''', unsafe_allow_html=True)
+
+    if view != "Single chart":
+        cells = get_grid_thumbnails(charts, live, var1, var2, grid_cells(charts, view, var1, var2, filt, grid_bin), ratio=True)
+        if cells:
+            chart_grid(cells, "fade-in-image-small")
         else:
             st.warning(f"Graph not found.")
-            st.info(f"Looking for: {filename}")
+            st.info(f"Looking for: {chart_filename(var1, var2, filt, 0, ratio=True)}")
+        return
+    elif cube is not None and cube.has_filter(filt):
+        # Same counts as the hexbin page, ratio computed in the chart
+        st.altair_chart(cube_chart(cube, filt, ratio=True, x_title=dy, y_title=dx), width="stretch")
+        return
+
+    # Fetch every bin threshold at once; the viewer switches between them
+    frames = get_live_frames(engine, var1, var2, filt, ratio=True) if live else get_chart_frames(index, var1, var2, filt)
+    if frames:
+        # Shown at 65% width (see .fade-in-image-small)
+        chart_viewer(frames, "fade-in-image-small", sizes="65vw")
+        if not live:
+            prefetch_neighbours(index, var1, var2, filt)
+    else:
+        st.warning(f"Graph not found.")
+        st.info(f"Looking for: {chart_filename(var1, var2, filt, 0, ratio=True)}")
 
 # ==========================================
 # MAIN NAVIGATION & SIDEBAR SETUP
@@ -585,4 +932,14 @@ ratio_pg = st.Page(page_ratio_dashboard, title="Islands of Stability")
 
 pg = st.navigation([intro_pg, problem_pg, dashboard_pg, ratio_pg])
 
-pg.run()
\ No newline at end of file
+start_metrics_server()
+with APP_STEP.time(step=f"page:{pg.title}"):
+    pg.run()
+
+# Static pages don't load the Drive stack; fetch it while the user reads.
+if config.WARM_UP:
+    start_warm_up()
+
+# 3. DEBUG PANEL (DATA_PALETTE_DEBUG=1)
+if config.DEBUG_PANEL:
+    debug_panel()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from image_cache import trim_lru
+from mirror import write_atomic
+
+# ==========================================
+# STATIC CHART DELIVERY
+# ==========================================
+# Charts are written once into Streamlit's static folder under a
+# content-hash name and referenced by URL, instead of being inlined as
+# base64 data URIs. The browser downloads each chart once and keeps it:
+# the "?v=" argument makes Streamlit's static handler send a long-lived
+# Cache-Control header, which is safe because the name changes whenever
+# the content does. Requires `server.enableStaticServing` (.streamlit/config.toml).
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+CHARTS_SUBDIR = "charts"
+URL_PREFIX = "app/static"
+
+# The folder is a cache like any other: least recently served files are
+# removed once it grows past the budget (see image_cache.trim_lru).
+DEFAULT_BUDGET = 1024 * 1024 * 1024  # 1 GB
+# Published keys remembered in memory (the oldest are forgotten first).
+MAX_KEYS = 100_000
+
+
+def content_name(data, ext=".png"):
+    return hashlib.sha256(data).hexdigest()[:32] + ext
+
+
+class ChartPublisher:
+    def __init__(self, static_dir=STATIC_DIR, budget=DEFAULT_BUDGET, max_keys=MAX_KEYS):
+        self.charts_dir = os.path.join(static_dir, CHARTS_SUBDIR)
+        self.budget = budget
+        self.max_keys = max_keys
+        os.makedirs(self.charts_dir, exist_ok=True)
+        # (file_id, version) -> published file name, so a known chart is
+        # never read or hashed again.
+        self._published = OrderedDict()
+        self._lock = threading.Lock()
+        self._used = trim_lru(self.charts_dir, self.budget)
+
+    @staticmethod
+    def url_for(name):
+        return f"{URL_PREFIX}/{CHARTS_SUBDIR}/{name}?v={name[:8]}"
+
+    def publish(self, data, ext=".png"):
+        """Writes data to the static folder (once) and returns its URL."""
+        name = content_name(data, ext)
+        path = os.path.join(self.charts_dir, name)
+        if not os.path.exists(path):
+            write_atomic(path, data)
+            with self._lock:
+                self._used += len(data)
+                over = self._used > self.budget
+            if over:
+                used = trim_lru(self.charts_dir, self.budget, keep=name)
+                with self._lock:
+                    self._used = used
+        return name
+
+    def url(self, key, loader, ext=".png"):
+        """
+        Returns the URL for the chart identified by key, calling loader()
+        for its bytes only the first time (or if the file was cleaned up).
+        """
+        with self._lock:
+            name = self._published.get(key)
+            if name: self._published.move_to_end(key)
+        if name:
+            try:
+                os.utime(os.path.join(self.charts_dir, name))  # keeps the trim least-recently-used
+                return self.url_for(name)
+            except OSError:
+                pass  # trimmed; publish it again
+
+        data = loader()
+        if data is None: return None
+        name = self.publish(data, ext)
+        with self._lock:
+            self._published[key] = name
+            self._published.move_to_end(key)
+            while len(self._published) > self.max_keys:
+                self._published.popitem(last=False)
+        return self.url_for(name)
@@ -0,0 +1,230 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# METRICS
+# ==========================================
+# Minimal in-process counters, gauges and histograms for the hot paths
+# (Drive requests, caches, listings, page renders), shared by every
+# session and background thread. Exported in the Prometheus text format
+# on DATA_PALETTE_METRICS_PORT and summarised in the debug sidebar.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"): return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _labels(self, key):
+        return dict(zip(self.label_names, key))
+
+    def samples(self):
+        """[(sample name, labels, value)] in exposition order."""
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """+1 while the block runs (in-flight requests)."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (+Inf last), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self):
+        """{labels tuple: (count, mean, p95 bucket bound)} for the debug panel."""
+        out = {}
+        with self._lock:
+            for key, (counts, total, n) in self._values.items():
+                if not n: continue
+                seen = 0
+                p95 = float("inf")
+                for bound, c in zip(self.buckets + (float("inf"),), counts):
+                    seen += c
+                    if seen >= 0.95 * n:
+                        p95 = bound
+                        break
+                out[key] = (n, total / n, p95)
+        return out
+
+    def samples(self):
+        rows = []
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._values.items()):
+                labels = self._labels(key)
+                cumulative = 0
+                for bound, c in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += c
+                    rows.append((f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative))
+                rows.append((f"{self.name}_sum", labels, total))
+                rows.append((f"{self.name}_count", labels, n))
+        return rows
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._register(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, labels, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: m.name)
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- HOT-PATH METRICS (shared by every module) ---
+
+DRIVE_REQUESTS = REGISTRY.counter("drive_requests_total", "Drive API requests by operation and outcome.", ("op", "status"))
+DRIVE_LATENCY = REGISTRY.histogram("drive_request_seconds", "Drive API request latency.", ("op",))
+DRIVE_BYTES = REGISTRY.counter("drive_bytes_total", "Bytes downloaded from Drive.", ("op",))
+DRIVE_COALESCED = REGISTRY.counter("drive_coalesced_total", "Drive reads answered by an identical request already in flight.", ("op",))
+DRIVE_IN_FLIGHT = REGISTRY.gauge("drive_requests_in_flight", "Drive requests currently executing.")
+DRIVE_POOL_WAIT = REGISTRY.histogram("drive_pool_wait_seconds", "Time spent waiting for a pooled Drive connection.")
+CACHE_LOOKUPS = REGISTRY.counter("cache_lookups_total", "Cache lookups by cache and result (memory, disk, miss).", ("cache", "result"))
+CACHE_BYTES = REGISTRY.gauge("cache_memory_bytes", "Bytes held in memory by each cache.", ("cache",))
+LISTING_REFRESH = REGISTRY.histogram("listing_refresh_seconds", "Folder listing refreshes by mode (changes feed or full).", ("mode",))
+REVALIDATIONS = REGISTRY.counter("revalidations_total", "Background refreshes of listings and manifests by outcome (ok, empty, error).", ("name", "result"))
+APP_STEP = REGISTRY.histogram("app_step_seconds", "Time spent in app steps (manifest reads, chart fetches, page renders).", ("step",))
+APP_ERRORS = REGISTRY.counter("app_errors_total", "Errors shown to users, by step.", ("step",))
+
+
+def error_status(exc):
+    """HTTP status of a Drive error (403/429 = throttling), or the exception type."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    resp = getattr(exc, "resp", None)
+    if status is None and resp is not None:
+        status = getattr(resp, "status", None)
+    return str(status) if status else type(exc).__name__
+
+
+# ==========================================
+# HTTP EXPORT
+# ==========================================
+
+def start_http_server(port, registry=REGISTRY, addr="0.0.0.0"):
+    """Serves /metrics from a daemon thread; returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
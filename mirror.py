@@ -0,0 +1,156 @@
+"""
+Mirrors the hexbin and ratio chart folders (plus names.txt / names2.txt)
+from Google Drive into a local directory that LocalStorage can serve.
+
+    python mirror.py --dest mirror --workers 16
+
+Runs incrementally: files whose Drive md5Checksum matches the local copy
+are skipped, so re-running only downloads what changed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+from storage import DriveStorage, MANIFEST_NAME
+
+MIRRORED_FOLDERS = [config.DRIVE_FOLDER_ID_HEXBIN, config.DRIVE_FOLDER_ID_RATIO]
+MIRRORED_FILES = [config.FILE_ID_NAMES_TXT, config.FILE_ID_NAMES2_TXT]
+
+
+def load_service_account_info(secrets_path):
+    with open(secrets_path, "rb") as f:
+        return tomllib.load(f)["gcp_service_account"]
+
+
+def write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+
+def local_md5(path, manifest_entry):
+    """md5 of the local copy; trusts the manifest when the size still matches."""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    if manifest_entry and manifest_entry.get("size") == size and manifest_entry.get("md5Checksum"):
+        return manifest_entry["md5Checksum"]
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "md5").hexdigest()
+
+
+class Mirror:
+    def __init__(self, service_account_info, dest, workers=8):
+        # One connection per worker, reused for every download it makes.
+        self.storage = DriveStorage.from_service_account_info(service_account_info, pool_size=workers)
+        self.dest = os.path.abspath(dest)
+        self.workers = workers
+        self._lock = threading.Lock()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def _fetch(self, file_id, path, meta):
+        data = self.storage.read_bytes(file_id)
+        if meta.get("md5Checksum") and hashlib.md5(data).hexdigest() != meta["md5Checksum"]:
+            raise IOError(f"checksum mismatch for {os.path.basename(path)}")
+        write_atomic(path, data)
+        with self._lock:
+            self.downloaded += 1
+            self.bytes += len(data)
+
+    def sync_folder(self, folder_id, prune=False):
+        folder_path = os.path.join(self.dest, folder_id)
+        os.makedirs(folder_path, exist_ok=True)
+        manifest_path = os.path.join(folder_path, MANIFEST_NAME)
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        remote = self.storage.list_folder(folder_id)
+        todo = []
+        for name, meta in remote.items():
+            path = os.path.join(folder_path, name)
+            if meta.get("md5Checksum") and local_md5(path, manifest.get(name)) == meta["md5Checksum"]:
+                self.skipped += 1
+            else:
+                todo.append((name, meta, path))
+
+        new_manifest = {name: meta for name, meta in remote.items()}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._fetch, meta["id"], path, meta): name for name, meta, path in todo}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    self.failed += 1
+                    new_manifest.pop(name, None)
+                    print(f"  ! {name}: {e}", file=sys.stderr)
+
+        if prune:
+            for entry in os.scandir(folder_path):
+                if entry.is_file() and not entry.name.startswith(".") and entry.name not in remote:
+                    os.remove(entry.path)
+
+        write_atomic(manifest_path, json.dumps(new_manifest, indent=0, sort_keys=True).encode("utf-8"))
+        return len(remote)
+
+    def sync_file(self, file_id):
+        path = os.path.join(self.dest, file_id)
+        meta = self.storage.stat(file_id)
+        if local_md5(path, None) == meta.get("md5Checksum"):
+            self.skipped += 1
+            return
+        self._fetch(file_id, path, meta)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mirror the Drive chart corpus to a local directory.")
+    parser.add_argument("--dest", default=config.LOCAL_STORAGE_ROOT, help="target directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=8, help="parallel downloads (default: %(default)s)")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"), help="secrets.toml with [gcp_service_account]")
+    parser.add_argument("--prune", action="store_true", help="delete local files no longer present on Drive")
+    args = parser.parse_args(argv)
+
+    mirror = Mirror(load_service_account_info(args.secrets), args.dest, workers=args.workers)
+    os.makedirs(mirror.dest, exist_ok=True)
+    started = time.perf_counter()
+
+    for file_id in MIRRORED_FILES:
+        try:
+            mirror.sync_file(file_id)
+        except Exception as e:
+            mirror.failed += 1
+            print(f"  ! {file_id}: {e}", file=sys.stderr)
+    total = len(MIRRORED_FILES)
+    for folder_id in MIRRORED_FOLDERS:
+        total += mirror.sync_folder(folder_id, prune=args.prune)
+
+    elapsed = time.perf_counter() - started
+    mb = mirror.bytes / (1024 * 1024)
+    print(f"{total} files: {mirror.downloaded} downloaded, {mirror.skipped} up to date, {mirror.failed} failed")
+    print(f"{mb:.1f} MB in {elapsed:.1f}s ({mb / elapsed if elapsed else 0:.2f} MB/s, {mirror.downloaded / elapsed if elapsed else 0:.1f} files/s)")
+    return 1 if mirror.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ==========================================
+# BACKGROUND PREFETCH
+# ==========================================
+# After a chart is shown we guess what the user will look at next (the
+# neighbouring filter variables in the dropdown) and pull those charts
+# into the cache on a small thread pool. Each session has at most
+# one batch queued; a new selection cancels whatever hasn't started yet.
+# Jobs must not call Streamlit APIs - they run outside the script thread.
+
+
+def neighbours(options, current, limit=None):
+    """Other options ordered by distance from current in the list: +1, -1, +2, -2, ..."""
+    if current not in options: return list(options[:limit])
+    pos = options.index(current)
+    order = []
+    for step in range(1, len(options)):
+        for candidate in (pos + step, pos - step):
+            if 0 <= candidate < len(options):
+                order.append(options[candidate])
+    return order[:limit]
+
+
+class Prefetcher:
+    def __init__(self, workers=4):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._session_futures = {}
+        self._in_flight = set()
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def _run(self, key, job):
+        ok = False
+        try:
+            job()
+            ok = True
+        except Exception:
+            pass  # A failed prefetch only means the user pays for the fetch later.
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+                if ok: self.completed += 1
+                else: self.failed += 1
+
+    def _forget(self, session_id, entry):
+        """Drops a finished future; the session's entry goes with its last one."""
+        with self._lock:
+            futures = self._session_futures.get(session_id)
+            if futures is None or entry not in futures: return
+            futures.remove(entry)
+            if not futures:
+                del self._session_futures[session_id]
+
+    def cancel(self, session_id):
+        with self._lock:
+            futures = self._session_futures.pop(session_id, [])
+        for key, future in futures:
+            if future.cancel():
+                with self._lock:
+                    self.cancelled += 1
+                    self._in_flight.discard(key)
+
+    def schedule(self, session_id, jobs):
+        """
+        Replaces the session's pending prefetches with jobs, a list of
+        (key, callable). Keys already being fetched are skipped.
+        """
+        self.cancel(session_id)
+        futures = []
+        with self._lock:
+            for key, job in jobs:
+                if key in self._in_flight: continue
+                self._in_flight.add(key)
+                futures.append((key, self._pool.submit(self._run, key, job)))
+            if futures:
+                self._session_futures[session_id] = list(futures)
+        # Outside the lock: the callback runs right away for futures already done.
+        for entry in futures:
+            entry[1].add_done_callback(lambda _, entry=entry: self._forget(session_id, entry))
+
+    def stats(self):
+        return {
+            "in_flight": len(self._in_flight),
+            "sessions": len(self._session_futures),
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+        }
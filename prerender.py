@@ -0,0 +1,219 @@
+"""
+Re-renders the hexbin and ratio chart corpus (plus names.txt / names2.txt)
+from the applicant table, using every core.
+
+    python prerender.py --dataset applicants.parquet --dest mirror --cubes
+
+Output is laid out like mirror.py's, so the app can serve it straight away
+with DATA_PALETTE_STORAGE=local (or the folders can be uploaded to Drive):
+    <dest>/<hexbin folder id>/<var1>_vs_<var2>__filter_<f>_bin_ge_<n>.png
+    <dest>/<ratio folder id>/..._bin_ge_<n>_ratio.png
+    <dest>/<names.txt id>, <dest>/<names2.txt id>
+    <dest>/<cube folder id or "cubes">/<var1>_vs_<var2>.npz   (--cubes)
+
+Runs incrementally: every var1/var2/filter job is keyed by a hash of the
+columns it reads, so after a data refresh only the charts whose inputs
+actually changed are rendered again.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import config
+from aggregate_cube import build_cube, cube_filename
+from chart_index import chart_filename
+from hexbin_engine import HexbinEngine
+from mirror import write_atomic
+from storage import MANIFEST_NAME
+
+# Bump when the drawing code changes, to re-render everything.
+RENDER_VERSION = 1
+STATE_NAME = ".prerender.json"
+
+
+def column_digest(values):
+    return hashlib.sha256(np.ascontiguousarray(values).tobytes()).hexdigest()
+
+
+def job_digest(digests, names, gridsize):
+    h = hashlib.sha256(f"{RENDER_VERSION}\0{gridsize}\0".encode("utf-8"))
+    for name in names:
+        h.update(f"{name}\0{digests[name]}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+# ==========================================
+# WORKERS (one engine per process)
+# ==========================================
+
+_engine = None
+
+
+def _init_worker(dataset, target, gridsize, variables):
+    global _engine
+    _engine = HexbinEngine(dataset, target=target, gridsize=gridsize, variables=variables, optimize_png=True)
+
+
+def _write(folder, name, data):
+    write_atomic(os.path.join(folder, name), data)
+    return name, {"md5Checksum": hashlib.md5(data).hexdigest(), "size": len(data)}
+
+
+def render_charts(var1, var2, filt, hexbin_dir, ratio_dir):
+    """Every bin of one combination, hexbin and ratio (they share the counts)."""
+    hexbin, ratio = [], []
+    for b in _engine.bins(var1, var2, filt):
+        hexbin.append(_write(hexbin_dir, chart_filename(var1, var2, filt, b), _engine.render(var1, var2, filt, b)))
+        ratio.append(_write(ratio_dir, chart_filename(var1, var2, filt, b, ratio=True), _engine.render(var1, var2, filt, b, ratio=True)))
+    _engine.compute.cache_clear()
+    return hexbin, ratio
+
+
+def render_cube(var1, var2, filters, cube_dir):
+    return [_write(cube_dir, cube_filename(var1, var2), build_cube(_engine, var1, var2, filters=filters).to_bytes())]
+
+
+# ==========================================
+# DRIVER
+# ==========================================
+
+class Prerenderer:
+    def __init__(self, dataset, dest, variables=None, target=config.DATASET_TARGET, gridsize=config.HEXBIN_GRIDSIZE, workers=None, cubes=False, force=False):
+        self.dataset = dataset
+        self.dest = os.path.abspath(dest)
+        self.target = target
+        self.gridsize = gridsize
+        self.workers = workers or os.cpu_count()
+        self.cubes = cubes
+        self.force = force
+
+        self.hexbin_dir = os.path.join(self.dest, config.DRIVE_FOLDER_ID_HEXBIN)
+        self.ratio_dir = os.path.join(self.dest, config.DRIVE_FOLDER_ID_RATIO)
+        self.cube_dir = os.path.join(self.dest, config.DRIVE_FOLDER_ID_CUBES or "cubes")
+        self.state_path = os.path.join(self.dest, STATE_NAME)
+
+        # Loaded once here for the variable list and input hashes; workers load their own.
+        engine = HexbinEngine(dataset, target=target, gridsize=gridsize, variables=variables)
+        unknown = sorted(set(engine.requested) - set(engine.variables())) if variables else []
+        if unknown:
+            raise ValueError(f"not in the dataset: {', '.join(unknown)}")
+        self.variables = engine.variables()
+        self.digests = {var: column_digest(engine.column(var)) for var in self.variables}
+        self.digests[target] = column_digest(engine.is_defaulter)
+
+        self.rendered = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def _load_json(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def jobs(self):
+        """[(state key, input digest, expected outputs, fn, args)] for every job."""
+        jobs = []
+        for var1 in self.variables:
+            for var2 in self.variables:
+                for filt in self.variables:
+                    key = f"charts:{var1}:{var2}:{filt}"
+                    digest = job_digest(self.digests, (var1, var2, filt, self.target), self.gridsize)
+                    outputs = [os.path.join(self.hexbin_dir, chart_filename(var1, var2, filt, b)) for b in range(10)]
+                    outputs += [os.path.join(self.ratio_dir, chart_filename(var1, var2, filt, b, ratio=True)) for b in range(10)]
+                    jobs.append((key, digest, outputs, render_charts, (var1, var2, filt, self.hexbin_dir, self.ratio_dir)))
+                if self.cubes:
+                    key = f"cube:{var1}:{var2}"
+                    digest = job_digest(self.digests, self.variables + [self.target], self.gridsize)
+                    outputs = [os.path.join(self.cube_dir, cube_filename(var1, var2))]
+                    jobs.append((key, digest, outputs, render_cube, (var1, var2, self.variables, self.cube_dir)))
+        return jobs
+
+    def run(self):
+        for folder in (self.hexbin_dir, self.ratio_dir) + ((self.cube_dir,) if self.cubes else ()):
+            os.makedirs(folder, exist_ok=True)
+        state = {} if self.force else self._load_json(self.state_path)
+        manifests = {folder: self._load_json(os.path.join(folder, MANIFEST_NAME)) for folder in (self.hexbin_dir, self.ratio_dir, self.cube_dir)}
+
+        todo = []
+        for key, digest, outputs, fn, args in self.jobs():
+            if state.get(key) == digest and all(os.path.exists(p) for p in outputs):
+                self.skipped += 1
+            else:
+                state.pop(key, None)
+                todo.append((key, digest, fn, args))
+
+        if todo:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.dataset, self.target, self.gridsize, self.variables)) as pool:
+                futures = {pool.submit(fn, *args): (key, digest, fn) for key, digest, fn, args in todo}
+                for future in as_completed(futures):
+                    key, digest, fn = futures[future]
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"  ! {key}: {e}", file=sys.stderr)
+                        continue
+                    if fn is render_charts:
+                        hexbin, ratio = results
+                        manifests[self.hexbin_dir].update(hexbin)
+                        manifests[self.ratio_dir].update(ratio)
+                    else:
+                        manifests[self.cube_dir].update(results)
+                    state[key] = digest
+                    self.rendered += 1
+
+        # Checksums for LocalStorage, so the app's caches key on content.
+        for folder, manifest in manifests.items():
+            if os.path.isdir(folder):
+                write_atomic(os.path.join(folder, MANIFEST_NAME), json.dumps(manifest, indent=0, sort_keys=True).encode("utf-8"))
+        write_atomic(self.state_path, json.dumps(state, indent=0, sort_keys=True).encode("utf-8"))
+        self.write_manifests()
+
+    def write_manifests(self):
+        """names.txt / names2.txt: one chart file name per line, as ChartIndex.build reads them."""
+        names, names2 = [], []
+        for var1 in self.variables:
+            for var2 in self.variables:
+                for filt in self.variables:
+                    for b in range(10):
+                        if os.path.exists(os.path.join(self.hexbin_dir, chart_filename(var1, var2, filt, b))):
+                            names.append(chart_filename(var1, var2, filt, b))
+                        if os.path.exists(os.path.join(self.ratio_dir, chart_filename(var1, var2, filt, b, ratio=True))):
+                            names2.append(chart_filename(var1, var2, filt, b, ratio=True))
+        write_atomic(os.path.join(self.dest, config.FILE_ID_NAMES_TXT), "\n".join(names).encode("utf-8"))
+        write_atomic(os.path.join(self.dest, config.FILE_ID_NAMES2_TXT), "\n".join(names2).encode("utf-8"))
+        return len(names), len(names2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the hexbin/ratio chart corpus and its manifests from the dataset.")
+    parser.add_argument("--dataset", default=config.DATASET_PATH, required=not config.DATASET_PATH, help="applicant table (.parquet / .feather)")
+    parser.add_argument("--dest", default=config.LOCAL_STORAGE_ROOT, help="output directory (default: %(default)s)")
+    parser.add_argument("--variables", help="comma-separated df1_* variables (default: config.LIVE_VARIABLES)")
+    parser.add_argument("--target", default=config.DATASET_TARGET, help="target column (default: %(default)s)")
+    parser.add_argument("--gridsize", type=int, default=config.HEXBIN_GRIDSIZE, help="hexbin grid size (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="render processes (default: %(default)s)")
+    parser.add_argument("--cubes", action="store_true", help="also write the aggregate cubes (see aggregate_cube.py)")
+    parser.add_argument("--force", action="store_true", help="re-render everything")
+    args = parser.parse_args(argv)
+
+    variables = [v.strip() for v in args.variables.split(",") if v.strip()] if args.variables else None
+    started = time.perf_counter()
+    renderer = Prerenderer(args.dataset, args.dest, variables, target=args.target, gridsize=args.gridsize, workers=args.workers, cubes=args.cubes, force=args.force)
+    renderer.run()
+
+    elapsed = time.perf_counter() - started
+    print(f"{renderer.rendered + renderer.skipped + renderer.failed} jobs: {renderer.rendered} rendered, {renderer.skipped} up to date, {renderer.failed} failed in {elapsed:.1f}s ({renderer.workers} workers)")
+    return 1 if renderer.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
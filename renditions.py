@@ -0,0 +1,101 @@
+import io
+import threading
+
+from PIL import Image, features
+
+# ==========================================
+# CHART RENDITIONS (WebP + viewport sizes)
+# ==========================================
+# The stored charts are large PNGs. For display we derive WebP copies at a
+# few widths and let the browser choose via <picture>/srcset; the original
+# PNG stays as the fallback for browsers without WebP. Renditions are
+# cached by source checksum, so each one is encoded once per chart version.
+
+RENDITION_WIDTHS = (800, 1400)
+THUMBNAIL_WIDTH = 480   # grid view (small multiples)
+WEBP_QUALITY = 85
+WEBP_SUPPORTED = features.check("webp")
+
+
+def encode_rendition(data, width, fmt="WEBP"):
+    """Returns the chart as WebP (or `fmt`), downscaled to width if the source is wider."""
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        if fmt == "WEBP":
+            img.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            img.save(out, fmt, optimize=True)
+        return out.getvalue()
+
+
+def _load_once(load_source):
+    """Loads the original at most once, however many renditions need it."""
+    source = {}
+    lock = threading.Lock()
+
+    def get_source():
+        with lock:
+            if "data" not in source:
+                source["data"] = load_source()
+            return source["data"]
+    return get_source
+
+
+class RenditionPipeline:
+    """
+    Publishes a chart and its renditions to the static folder.
+    `cache` is an ImageCache holding encoded renditions, `publisher` a
+    media.ChartPublisher. Safe to call from background threads.
+    """
+    def __init__(self, cache, publisher, widths=RENDITION_WIDTHS):
+        self.cache = cache
+        self.publisher = publisher
+        self.widths = tuple(sorted(widths))
+
+    def publish(self, file_id, version, load_source):
+        """Returns {"png": url, "webp": [(width, url), ...]} for one chart version."""
+        get_source = _load_once(load_source)
+        urls = {"png": self.publisher.url((file_id, version), get_source), "webp": []}
+        if not WEBP_SUPPORTED:
+            return urls
+
+        for width in self.widths:
+            url = self._rendition_url(file_id, version, width, get_source)
+            if url:
+                urls["webp"].append((width, url))
+        return urls
+
+    def _rendition_url(self, file_id, version, width, get_source, ext=".webp"):
+        def render():
+            key = (file_id, f"{version}.w{width}{ext}")
+            cached = self.cache.get(key)
+            if cached is not None: return cached
+            data = get_source()
+            if data is None: return None
+            encoded = encode_rendition(bytes(data), width, "WEBP" if ext == ".webp" else "PNG")
+            self.cache.put(key, encoded)
+            return encoded
+        return self.publisher.url((file_id, version, width, ext.lstrip(".")), render, ext=ext)
+
+    def thumbnail(self, file_id, version, load_source, width=THUMBNAIL_WIDTH):
+        """Returns {"png": url, "thumb": url}: the original plus a small copy for the grid view."""
+        get_source = _load_once(load_source)
+        png = self.publisher.url((file_id, version), get_source)
+        thumb = self._rendition_url(file_id, version, width, get_source, ext=".webp" if WEBP_SUPPORTED else ".png")
+        return {"png": png, "thumb": thumb or png}
+
+
+def picture_html(urls, css_class, sizes="100vw"):
+    """<picture> with WebP sources and the original PNG as fallback."""
+    if not urls["webp"]:
+        return f'<img src="{urls["png"]}" class="{css_class}">'
+    srcset = ", ".join(f"{url} {width}w" for width, url in urls["webp"])
+    return (
+        f'<picture><source type="image/webp" srcset="{srcset}" sizes="{sizes}">'
+        f'<img src="{urls["png"]}" class="{css_class}"></picture>'
+    )
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+
+from metrics import REVALIDATIONS
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# STALE-WHILE-REVALIDATE
+# ==========================================
+# Folder listings and manifests change rarely but are slow to fetch. A
+# TTL cache makes the first user after expiry wait for the refresh (and
+# see an error if Drive fails at that moment). Instead, the last good
+# value is served straight away; once it is older than max_age a single
+# background thread fetches the new one and swaps it in only if that
+# succeeded. Only the very first load (nothing to serve yet) blocks.
+
+
+class StaleWhileRevalidate:
+    """
+    loader(previous) returns the new value; `previous` is the value being
+    served (None on the first load), so loaders can skip work when nothing
+    changed. A loader that raises or returns None leaves the current value
+    in place. Loaders run on a background thread, so they must not call
+    Streamlit. `clock` returns seconds (injectable for tests).
+    """
+    def __init__(self, loader, max_age, name="value", initial=None, clock=time.monotonic):
+        self.loader = loader
+        self.max_age = max_age
+        self.name = name  # label in the metrics and thread names
+        self.clock = clock
+        self._value = initial
+        # A seeded value (e.g. read from disk) is revalidated on first use.
+        self._loaded_at = 0.0 if initial is None else -float("inf")
+        self._refreshing = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.last_error = None
+
+    def _store(self, value):
+        with self._lock:
+            self._value = value
+            self._loaded_at = self.clock()
+
+    def get(self):
+        """The current value; triggers a background refresh once it is stale."""
+        with self._lock:
+            value = self._value
+            start = value is not None and not self._refreshing and self.clock() - self._loaded_at > self.max_age
+            if start:
+                self._refreshing = True
+                self._thread = threading.Thread(target=self._refresh, name=f"revalidate:{self.name}", daemon=True)
+        if value is None:
+            return self._load_now()
+        if start:
+            self._thread.start()
+        return value
+
+    def join(self, timeout=None):
+        """Waits for the background refresh in progress, if any."""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+    def _load_now(self):
+        """First load, in the caller's thread. Raises if the loader does."""
+        with self._load_lock:
+            if self._value is not None: return self._value
+            value = self.loader(None)
+            if value is not None:
+                self._store(value)
+            return value
+
+    def _refresh(self):
+        value = None
+        try:
+            value = self.loader(self._value)
+            self.last_error = None
+            REVALIDATIONS.inc(name=self.name, result="ok" if value is not None else "empty")
+        except Exception as e:
+            self.last_error = e
+            REVALIDATIONS.inc(name=self.name, result="error")
+            logger.warning("Revalidating %s failed, serving the previous value: %s", self.name, e)
+        if value is not None:
+            self._store(value)
+        with self._lock:
+            if value is None:
+                # Try again after another max_age rather than on every request.
+                self._loaded_at = self.clock()
+            self._refreshing = False
+
+    def stats(self):
+        with self._lock:
+            age = self.clock() - self._loaded_at if self._value is not None else None
+            refreshing = self._refreshing
+        return {"age": age, "refreshing": refreshing, "last_error": repr(self.last_error) if self.last_error else None}
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+from metrics import CACHE_LOOKUPS
+from mirror import write_atomic
+
+# ==========================================
+# SHARED CACHE (across processes on one host)
+# ==========================================
+# st.cache_data / st.cache_resource live inside one process, so every
+# replica would list the folders, read names.txt and download each chart
+# on its own. This store sits on local disk and is shared by all replicas
+# pointing at the same directory:
+#
+#   <root>/index.sqlite          key -> blob digest, size, timestamps (WAL)
+#   <root>/blobs/ab/abcdef...    content-addressed data, written atomically
+#   <root>/locks/<hash>.lock     one flock per key being loaded
+#
+# get_or_load takes the key's lock before calling the loader, so when
+# several replicas miss at once only one of them goes to Drive and the
+# others read its result.
+
+DEFAULT_BUDGET = 2 * 1024 * 1024 * 1024  # 2 GB
+
+# Last-access times are only rewritten when older than this, to keep hits read-only.
+TOUCH_INTERVAL = 60
+
+
+class SharedCache:
+    def __init__(self, root, budget=DEFAULT_BUDGET, name="shared"):
+        self.root = root
+        self.budget = budget
+        self.name = name  # label in the metrics
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "locks"), exist_ok=True)
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+
+    # --- INDEX ---
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _db(self):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    # --- BLOBS ---
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _write_blob(self, digest, data):
+        path = self._blob_path(digest)
+        if os.path.exists(path): return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data)
+
+    # --- LOCKING ---
+
+    @contextmanager
+    def lock(self, key):
+        """Exclusive across processes (and threads) for one key."""
+        if fcntl is None:
+            yield
+            return
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        with open(os.path.join(self.root, "locks", name + ".lock"), "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # --- PUBLIC API ---
+
+    def get(self, key, max_age=None):
+        """Bytes stored under key, or None if missing or older than max_age seconds."""
+        row = self._connection().execute("SELECT digest, stored_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None: return None
+        digest, stored_at, accessed_at = row
+        now = time.time()
+        if max_age is not None and now - stored_at > max_age: return None
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Trimmed by another process between the lookup and the read.
+            with self._db() as db:
+                db.execute("DELETE FROM entries WHERE key = ? AND digest = ?", (key, digest))
+            return None
+        if now - accessed_at > TOUCH_INTERVAL:
+            with self._db() as db:
+                db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return data
+
+    def put(self, key, data):
+        data = bytes(data)
+        digest = hashlib.sha256(data).hexdigest()
+        self._write_blob(digest, data)
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, digest, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, digest, len(data), now, now),
+            )
+        self.trim()
+
+    def get_or_load(self, key, loader, max_age=None):
+        """
+        Cached bytes for key, else loader() - called by at most one process
+        at a time per key. A loader returning None (or raising) stores nothing.
+        """
+        data = self.get(key, max_age)
+        if data is not None:
+            CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+            return data
+        with self.lock(key):
+            # Another replica may have loaded it while we waited.
+            data = self.get(key, max_age)
+            if data is not None:
+                CACHE_LOOKUPS.inc(cache=self.name, result="peer")
+                return data
+            CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            data = loader()
+            if data is not None:
+                self.put(key, data)
+            return data
+
+    def get_or_load_json(self, key, loader, max_age=None):
+        """get_or_load for JSON-serializable values (listings)."""
+        def load():
+            value = loader()
+            return None if value is None else json.dumps(value, separators=(",", ":")).encode("utf-8")
+        data = self.get_or_load(key, load, max_age)
+        return None if data is None else json.loads(data)
+
+    # --- EVICTION ---
+
+    def trim(self):
+        """Drops least recently used entries (and unreferenced blobs) over budget."""
+        db = self._connection()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.budget: return
+        orphans = []
+        with self._db() as db:
+            for key, digest, size in db.execute("SELECT key, digest, size FROM entries ORDER BY accessed_at").fetchall():
+                if total <= self.budget: break
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                if db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+                    orphans.append(digest)
+        for digest in orphans:
+            try: os.remove(self._blob_path(digest))
+            except OSError: pass
+
+    def stats(self):
+        count, total = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": total, "budget": self.budget}
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import mmap
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from metrics import DRIVE_BYTES, DRIVE_COALESCED, DRIVE_IN_FLIGHT, DRIVE_LATENCY, DRIVE_POOL_WAIT, DRIVE_REQUESTS, error_status
+
+# ==========================================
+# STORAGE BACKENDS
+# ==========================================
+# Every backend exposes the same four operations:
+#   list_folder(folder_id) -> {filename: {id, md5Checksum, modifiedTime, size}}
+#   read_bytes(file_id)    -> bytes-like object
+#   read_text(file_id)     -> str
+#   stat(file_id)          -> {id, name, md5Checksum, modifiedTime, size}
+# Backends with `supports_changes` also provide an incremental feed:
+#   start_page_token()     -> cursor for "now"
+#   list_changes(token)    -> ([change, ...], new_token)
+# The app only talks to this interface, so Drive can be swapped for a local
+# mirror (see mirror.py) without touching the pages.
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+FILE_FIELDS = "id, name, md5Checksum, modifiedTime, size"
+CHANGE_FIELDS = f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}, parents, trashed))"
+
+# Name of the per-folder checksum manifest written by the mirror command.
+MANIFEST_NAME = ".manifest.json"
+
+
+def _import_google():
+    """
+    The Google client stack takes a few hundred ms to import, so it is
+    only loaded once a Drive backend is built (or by warm_up) - the static
+    pages never pay for it.
+    """
+    import google_auth_httplib2
+    import httplib2
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+    return google_auth_httplib2, httplib2, service_account, build
+
+
+def warm_up():
+    """Imports the Drive client ahead of time (call from a background thread)."""
+    _import_google()
+    from googleapiclient.discovery_cache import get_static_doc
+    get_static_doc("drive", "v3")
+
+
+def _file_meta(item):
+    return {
+        "id": item['id'],
+        "name": item.get('name'),
+        "md5Checksum": item.get('md5Checksum'),
+        "modifiedTime": item.get('modifiedTime'),
+        "size": int(item.get('size', 0)),
+    }
+
+
+class HttpPool:
+    """
+    Checkout-based pool of authorized httplib2 connections.
+    httplib2.Http objects are not thread-safe but keep their TLS connection
+    alive between requests, so each thread borrows one for the duration of
+    a request and hands it back for the next caller to reuse.
+    """
+    def __init__(self, factory, size=8, wait_timeout=60):
+        self._factory = factory
+        self._size = size
+        self._wait_timeout = wait_timeout  # seconds to wait when exhausted
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.in_use = 0
+
+    @contextmanager
+    def connection(self):
+        try:
+            http = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self._size
+                if create: self._created += 1
+            if create:
+                try:
+                    http = self._factory()
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                # Pool exhausted: wait for a connection to come back.
+                try:
+                    with DRIVE_POOL_WAIT.time():
+                        http = self._idle.get(timeout=self._wait_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No Drive connection free after {self._wait_timeout}s ({self._size} in use)") from None
+        with self._lock:
+            self.in_use += 1
+        try:
+            yield http
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._idle.put(http)
+
+    def stats(self):
+        return {"size": self._size, "created": self._created, "in_use": self.in_use}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function and everyone who asks for the same key meanwhile waits for it
+    and gets the same result (or exception). Nothing is kept afterwards -
+    caching is the callers' job.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Returns (result, shared), shared=True when another caller's result was reused."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None: raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class DriveStorage:
+    """
+    Google Drive v3 backend.
+    The service object only builds requests; each request is executed on a
+    connection borrowed from `http_pool`, which makes the backend safe to
+    share between session threads and background workers. Identical reads
+    in flight at the same time (many sessions opening the default chart,
+    a listing expiring under load) share a single request.
+    """
+    cacheable = True
+    supports_changes = True
+
+    def __init__(self, service, http_pool=None):
+        self.service = service
+        self.http_pool = http_pool
+        self._flights = SingleFlight()
+
+    @classmethod
+    def from_service_account_info(cls, info, pool_size=8, timeout=60):
+        google_auth_httplib2, httplib2, service_account, build = _import_google()
+        creds = service_account.Credentials.from_service_account_info(info, scopes=DRIVE_SCOPES)
+        pool = HttpPool(lambda: google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=timeout)), size=pool_size)
+        # The discovery document bundled with the client: no extra request.
+        return cls(build('drive', 'v3', credentials=creds, cache_discovery=False, static_discovery=True), pool)
+
+    @contextmanager
+    def _connection(self):
+        if self.http_pool is None:
+            yield None
+            return
+        with self.http_pool.connection() as http:
+            yield http
+
+    def _execute(self, request, op):
+        """Runs one request on a pooled connection, recording latency and outcome under `op`."""
+        with self._connection() as http, DRIVE_IN_FLIGHT.track(), DRIVE_LATENCY.time(op=op):
+            try:
+                result = request.execute() if http is None else request.execute(http=http)
+            except Exception as e:
+                DRIVE_REQUESTS.inc(op=op, status=error_status(e))
+                raise
+        DRIVE_REQUESTS.inc(op=op, status="ok")
+        return result
+
+    def _single_flight(self, op, key, fn):
+        result, shared = self._flights.do((op, key), fn)
+        if shared:
+            DRIVE_COALESCED.inc(op=op)
+        return result
+
+    def list_folder(self, folder_id):
+        return self._single_flight("files.list", folder_id, lambda: self._list_folder(folder_id))
+
+    def _list_folder(self, folder_id):
+        files_dict = {}
+        page_token = None
+        while True:
+            results = self._execute(self.service.files().list(
+                q=f"'{folder_id}' in parents and trashed=false",
+                fields=f"nextPageToken, files({FILE_FIELDS})",
+                pageToken=page_token
+            ), "files.list")
+
+            for item in results.get('files', []):
+                meta = _file_meta(item)
+                files_dict[meta.pop("name")] = meta
+
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return files_dict
+
+    def read_bytes(self, file_id):
+        return self._single_flight("files.get_media", file_id, lambda: self._read_bytes(file_id))
+
+    def _read_bytes(self, file_id):
+        # Charts and manifests are small, so one request is enough.
+        data = self._execute(self.service.files().get_media(fileId=file_id), "files.get_media")
+        DRIVE_BYTES.inc(len(data), op="files.get_media")
+        return data
+
+    def read_text(self, file_id):
+        return self.read_bytes(file_id).decode('utf-8')
+
+    def stat(self, file_id):
+        return self._single_flight("files.get", file_id, lambda: _file_meta(
+            self._execute(self.service.files().get(fileId=file_id, fields=FILE_FIELDS), "files.get")))
+
+    def start_page_token(self):
+        return self._execute(self.service.changes().getStartPageToken(), "changes.getStartPageToken")['startPageToken']
+
+    def list_changes(self, page_token):
+        """
+        Returns every change since page_token as a list of
+        {fileId, removed, file} dicts (file includes parents/trashed),
+        plus the token to resume from next time.
+        """
+        changes = []
+        while True:
+            results = self._execute(self.service.changes().list(
+                pageToken=page_token,
+                fields=CHANGE_FIELDS,
+                includeRemoved=True,
+                spaces="drive"
+            ), "changes.list")
+            for change in results.get('changes', []):
+                item = change.get('file')
+                changes.append({
+                    "fileId": change['fileId'],
+                    "removed": change.get('removed', False),
+                    "file": dict(_file_meta(item), parents=item.get('parents', []), trashed=item.get('trashed', False)) if item else None,
+                })
+            if 'newStartPageToken' in results:
+                return changes, results['newStartPageToken']
+            page_token = results['nextPageToken']
+
+
+class LocalStorage:
+    """
+    Serves files from a local directory laid out like the Drive corpus:
+        <root>/<folder_id>/<filename>   images inside a Drive folder
+        <root>/<file_id>                standalone files (names.txt, ...)
+    File ids are paths relative to root. Reads are memory-mapped, so image
+    bytes come straight from the page cache without an extra copy.
+    """
+    # The files are already local; caching them again would only double memory.
+    cacheable = False
+    supports_changes = False
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, file_id):
+        path = os.path.abspath(os.path.join(self.root, file_id))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise FileNotFoundError(file_id)
+        return path
+
+    @staticmethod
+    def _mtime(st):
+        return datetime.fromtimestamp(st.st_mtime, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+    def _load_manifest(self, folder_path):
+        try:
+            with open(os.path.join(folder_path, MANIFEST_NAME), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def list_folder(self, folder_id):
+        folder_path = self._path(folder_id)
+        manifest = self._load_manifest(folder_path)
+        files_dict = {}
+        for entry in os.scandir(folder_path):
+            if not entry.is_file() or entry.name.startswith("."): continue
+            st = entry.stat()
+            known = manifest.get(entry.name, {})
+            # Only trust a recorded checksum if the file hasn't changed since.
+            md5 = known.get("md5Checksum") if known.get("size") == st.st_size else None
+            files_dict[entry.name] = {
+                "id": f"{folder_id}/{entry.name}",
+                "md5Checksum": md5,
+                "modifiedTime": self._mtime(st),
+                "size": st.st_size,
+            }
+        return files_dict
+
+    def read_bytes(self, file_id):
+        with open(self._path(file_id), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            # The mapping outlives the file handle; the view keeps it alive.
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def read_text(self, file_id):
+        with open(self._path(file_id), encoding='utf-8') as f:
+            return f.read()
+
+    def stat(self, file_id):
+        path = self._path(file_id)
+        st = os.stat(path)
+        return {
+            "id": file_id,
+            "name": os.path.basename(path),
+            "md5Checksum": hashlib.md5(self.read_bytes(file_id)).hexdigest(),
+            "modifiedTime": self._mtime(st),
+            "size": st.st_size,
+        }
+
+
+def create_storage(backend, local_root=None, service_account_info=None, pool_size=8):
+    """Builds the backend named in config.STORAGE_BACKEND ('drive', 'local' or 'fake')."""
+    if backend == "local":
+        return LocalStorage(local_root)
+    if backend == "fake":
+        # Offline Drive (fake_drive.py) behind the real DriveStorage; the
+        # pool only bounds concurrency like real connections would.
+        from fake_drive import default_service
+        return DriveStorage(default_service(), HttpPool(object, size=pool_size))
+    if backend == "drive":
+        return DriveStorage.from_service_account_info(service_account_info, pool_size=pool_size)
+    raise ValueError(f"Unknown storage backend: {backend}")
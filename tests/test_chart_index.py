@@ -0,0 +1,91 @@
+import gzip
+import json
+
+from chart_index import ChartIndex, chart_filename, fingerprint, parse_chart_name
+
+
+def meta(file_id, md5=None, size=100):
+    return {"id": file_id, "md5Checksum": md5 or f"md5-{file_id}", "modifiedTime": "2025-09-01T00:00:00Z", "size": size}
+
+
+NAMES = [
+    "df1_AMT_CREDIT_vs_df1_DAYS_BIRTH__filter_df1_AMT_ANNUITY_bin_ge_0.png",
+    "df1_AMT_CREDIT_vs_df1_DAYS_BIRTH__filter_df1_AMT_ANNUITY_bin_ge_3.png",
+    "df1_AMT_CREDIT_vs_df1_DAYS_BIRTH__filter_df1_CODE_GENDER_bin_ge_0.png",
+    "df1_DAYS_BIRTH_vs_df1_AMT_CREDIT__filter_df1_AMT_ANNUITY_bin_ge_0.png",
+]
+
+
+def build(names=NAMES, files=None):
+    files = files if files is not None else {name: meta(f"id{i}") for i, name in enumerate(names)}
+    return ChartIndex.build(names, files), files
+
+
+def test_parse_chart_name():
+    assert parse_chart_name(NAMES[1]) == ("df1_AMT_CREDIT", "df1_DAYS_BIRTH", "df1_AMT_ANNUITY", 3)
+    ratio = "df1_AMT_CREDIT_vs_df1_DAYS_BIRTH__filter_df1_AMT_ANNUITY_bin_ge_9_ratio.png"
+    assert parse_chart_name(ratio) == ("df1_AMT_CREDIT", "df1_DAYS_BIRTH", "df1_AMT_ANNUITY", 9)
+    assert parse_chart_name("names.txt") is None
+    assert parse_chart_name("df1_A_vs_df1_B.png") is None
+
+
+def test_chart_filename_round_trips():
+    for ratio in (False, True):
+        name = chart_filename("df1_EXT_SOURCE_1", "df1_EXT_SOURCE_2", "df1_NAME_FAMILY_STATUS", 7, ratio=ratio)
+        assert parse_chart_name(name) == ("df1_EXT_SOURCE_1", "df1_EXT_SOURCE_2", "df1_NAME_FAMILY_STATUS", 7)
+
+
+def test_build_and_lookup():
+    index, files = build()
+    assert len(index) == 2
+    assert index.var1_options() == ["df1_AMT_CREDIT", "df1_DAYS_BIRTH"]
+    assert index.var2_options("df1_AMT_CREDIT") == ["df1_DAYS_BIRTH"]
+    assert index.filter_options("df1_AMT_CREDIT", "df1_DAYS_BIRTH") == ["df1_AMT_ANNUITY", "df1_CODE_GENDER"]
+    assert index.bins("df1_AMT_CREDIT", "df1_DAYS_BIRTH", "df1_AMT_ANNUITY") == [0, 3]
+    entry = index.lookup("df1_AMT_CREDIT", "df1_DAYS_BIRTH", "df1_AMT_ANNUITY", 3)
+    assert entry == dict(files[NAMES[1]], name=NAMES[1])
+    assert index.lookup("df1_AMT_CREDIT", "df1_DAYS_BIRTH", "df1_AMT_ANNUITY", 5) is None
+    assert index.var2_options("df1_UNKNOWN") == []
+
+
+def test_build_skips_unparsable_and_missing_files():
+    files = {NAMES[0]: meta("id0")}
+    index, _ = build(NAMES + ["notes.png", "", "names.txt"], files)
+    assert [e["name"] for e in index.entries()] == [NAMES[0]]
+
+
+def test_fingerprint_follows_the_inputs():
+    index, files = build()
+    assert index.fingerprint == fingerprint(NAMES, files)
+    changed = dict(files, **{NAMES[0]: meta("id0", md5="other")})
+    assert fingerprint(NAMES, changed) != index.fingerprint
+    assert ChartIndex.build(NAMES, files, source_version="v1:v2").fingerprint == "v1:v2"
+
+
+def test_save_load_round_trip(tmp_path):
+    index, _ = build()
+    path = str(tmp_path / "index" / "hexbin.json.gz")
+    index.save(path)
+    loaded = ChartIndex.load(path)
+    assert loaded.tree == index.tree
+    assert loaded.fingerprint == index.fingerprint
+
+
+def test_load_rejects_missing_corrupt_and_old_files(tmp_path):
+    assert ChartIndex.load(str(tmp_path / "missing.json.gz")) is None
+    corrupt = tmp_path / "corrupt.json.gz"
+    corrupt.write_bytes(b"not gzip")
+    assert ChartIndex.load(str(corrupt)) is None
+    old = tmp_path / "old.json.gz"
+    old.write_bytes(gzip.compress(json.dumps({"version": 0, "tree": {}}).encode()))
+    assert ChartIndex.load(str(old)) is None
+
+
+def test_dedup_report_counts_identical_charts():
+    files = {name: meta(f"id{i}", md5="same") for i, name in enumerate(NAMES)}
+    files[NAMES[3]]["md5Checksum"] = None
+    report = build(files=files)[0].dedup_report()
+    assert report["charts"] == 4
+    assert report["unique"] == 2
+    assert report["unique_bytes"] == 200
+    assert report["no_checksum"] == 1
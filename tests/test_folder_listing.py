@@ -0,0 +1,79 @@
+from fake_drive import FakeDriveService
+from folder_listing import FolderListing
+from storage import DriveStorage
+
+FOLDER = "charts"
+
+
+def make_listing(tmp_path=None, full_relist_interval=None):
+    drive = FakeDriveService()
+    drive.put_file(FOLDER, "a.png", b"a")
+    drive.put_file(FOLDER, "b.png", b"b")
+    state = str(tmp_path / "listing.json") if tmp_path else None
+    listing = FolderListing(DriveStorage(drive), FOLDER, state_path=state, full_relist_interval=full_relist_interval)
+    listing.refresh()
+    return drive, listing
+
+
+def test_first_refresh_is_a_full_listing():
+    drive, listing = make_listing()
+    assert sorted(listing.files) == ["a.png", "b.png"]
+    assert listing.full_listings == 1
+    assert drive.calls["files.list"] == 1
+
+
+def test_changes_feed_tracks_add_rename_move_and_remove():
+    drive, listing = make_listing()
+    c_id = drive.put_file(FOLDER, "c.png", b"c")
+    listing.refresh()
+    assert sorted(listing.files) == ["a.png", "b.png", "c.png"]
+
+    drive.put_file(FOLDER, "c2.png", b"c", file_id=c_id)   # rename
+    drive.put_file("elsewhere", "b.png", b"b", file_id=listing.files["b.png"]["id"])  # move out
+    drive.remove_file(listing.files["a.png"]["id"])
+    listing.refresh()
+
+    assert sorted(listing.files) == ["c2.png"]
+    assert listing.files["c2.png"]["id"] == c_id
+    assert listing.full_listings == 1
+    assert listing.incremental_refreshes == 2
+    assert drive.calls["files.list"] == 1
+
+
+def test_version_changes_only_with_the_files():
+    drive, listing = make_listing()
+    version = listing.version
+    listing.refresh()
+    assert listing.version == version
+    drive.put_file(FOLDER, "a.png", b"new bytes")
+    listing.refresh()
+    assert listing.version != version
+
+
+def test_expired_token_falls_back_to_full_listing():
+    drive, listing = make_listing()
+    drive.put_file(FOLDER, "c.png", b"c")
+    listing.cursor = "9999"   # the fake answers 410 like Drive
+    listing.refresh()
+    assert sorted(listing.files) == ["a.png", "b.png", "c.png"]
+    assert listing.full_listings == 2
+    assert listing.cursor != "9999"
+
+
+def test_old_listing_is_rebuilt_with_a_full_relist():
+    drive, listing = make_listing(full_relist_interval=3600)
+    listing.refresh()
+    assert listing.full_listings == 1
+    listing.listed_at -= 7200
+    listing.refresh()
+    assert listing.full_listings == 2
+    assert drive.calls["files.list"] == 2
+
+
+def test_state_survives_a_restart(tmp_path):
+    drive, listing = make_listing(tmp_path)
+    restored = FolderListing(DriveStorage(drive), FOLDER, state_path=listing.state_path)
+    assert restored.files == listing.files
+    assert restored.cursor == listing.cursor
+    assert restored.version == listing.version
+    assert restored.listed_at == listing.listed_at
@@ -0,0 +1,38 @@
+import pytest
+
+from storage import HttpPool
+
+
+def test_connections_are_reused():
+    created = []
+    pool = HttpPool(lambda: created.append(object()) or created[-1], size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert len(created) == 1
+
+
+def test_failed_factory_frees_its_slot():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1: raise OSError("TLS handshake failed")
+        return object()
+
+    pool = HttpPool(factory, size=1)
+    with pytest.raises(OSError):
+        with pool.connection():
+            pass
+    with pool.connection() as http:
+        assert http is not None
+    assert pool.stats()["created"] == 1
+
+
+def test_exhausted_pool_times_out():
+    pool = HttpPool(object, size=1, wait_timeout=0.01)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
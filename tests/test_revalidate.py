@@ -0,0 +1,90 @@
+import pytest
+
+from revalidate import StaleWhileRevalidate
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class Source:
+    """Loader whose result and failures the tests control."""
+    def __init__(self):
+        self.value = "v1"
+        self.fail = False
+        self.calls = 0
+
+    def __call__(self, previous):
+        self.calls += 1
+        if self.fail: raise RuntimeError("Drive unavailable")
+        return self.value
+
+
+def make(max_age=60, initial=None):
+    source, clock = Source(), Clock()
+    return source, clock, StaleWhileRevalidate(source, max_age=max_age, initial=initial, clock=clock)
+
+
+def test_first_load_blocks_and_errors_propagate():
+    source, clock, swr = make()
+    source.fail = True
+    with pytest.raises(RuntimeError):
+        swr.get()
+    source.fail = False
+    assert swr.get() == "v1"
+
+
+def test_fresh_value_is_not_reloaded():
+    source, clock, swr = make()
+    assert swr.get() == "v1"
+    clock.advance(59)
+    assert swr.get() == "v1"
+    swr.join(5)
+    assert source.calls == 1
+
+
+def test_stale_value_is_served_while_refreshing():
+    source, clock, swr = make()
+    assert swr.get() == "v1"
+    source.value = "v2"
+    clock.advance(61)
+    assert swr.get() == "v1"   # stale, refresh started in the background
+    swr.join(5)
+    assert swr.get() == "v2"
+    assert source.calls == 2
+
+
+def test_last_good_value_survives_a_failed_refresh():
+    source, clock, swr = make()
+    assert swr.get() == "v1"
+    source.fail = True
+    clock.advance(61)
+    assert swr.get() == "v1"
+    swr.join(5)
+    assert swr.get() == "v1"
+    assert isinstance(swr.last_error, RuntimeError)
+    assert swr.stats()["age"] == 0   # retried only after another max_age
+
+
+def test_none_keeps_the_previous_value():
+    source, clock, swr = make()
+    assert swr.get() == "v1"
+    source.value = None
+    clock.advance(61)
+    swr.get()
+    swr.join(5)
+    assert swr.get() == "v1"
+
+
+def test_seeded_value_is_served_then_revalidated():
+    source, clock, swr = make(initial="from disk")
+    assert swr.get() == "from disk"
+    swr.join(5)
+    assert swr.get() == "v1"
@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from shared_cache import SharedCache, fcntl
+
+
+def load_once(root, key, marker, results):
+    def loader():
+        with open(marker, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.3)
+        return b"payload"
+    results.put(SharedCache(root).get_or_load(key, loader))
+
+
+@pytest.mark.skipif(fcntl is None, reason="cross-process locking needs fcntl")
+def test_processes_share_one_load(tmp_path):
+    root, marker = str(tmp_path / "cache"), str(tmp_path / "loads")
+    SharedCache(root)  # create the schema before the race
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=load_once, args=(root, "text/names", marker, results)) for _ in range(4)]
+    for p in procs: p.start()
+    values = [results.get(timeout=30) for _ in procs]
+    for p in procs: p.join(timeout=30)
+
+    assert values == [b"payload"] * 4
+    with open(marker) as f:
+        assert len(f.read().split()) == 1
+
+
+def test_get_respects_max_age(tmp_path):
+    cache = SharedCache(str(tmp_path))
+    cache.put("k", b"v")
+    assert cache.get("k") == b"v"
+    assert cache.get("k", max_age=60) == b"v"
+    time.sleep(0.05)
+    assert cache.get("k", max_age=0.01) is None
+
+
+def test_failed_load_stores_nothing(tmp_path):
+    def fail():
+        raise RuntimeError("Drive unavailable")
+
+    cache = SharedCache(str(tmp_path))
+    assert cache.get_or_load("k", lambda: None) is None
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("k", fail)
+    assert cache.get("k") is None
+
+
+def test_trim_keeps_the_budget(tmp_path):
+    cache = SharedCache(str(tmp_path), budget=2500)
+    for i in range(5):
+        cache.put(f"k{i}", bytes([i]) * 1000)
+    stats = cache.stats()
+    assert stats["bytes"] <= 2500
+    assert cache.get("k4") is not None and cache.get("k0") is None
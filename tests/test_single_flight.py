@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from fake_drive import FakeDriveService
+from storage import DriveStorage, SingleFlight
+
+
+def run_concurrently(n, fn):
+    results, errors = [], []
+    barrier = threading.Barrier(n)
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return results, errors
+
+
+def test_concurrent_reads_share_one_download():
+    drive = FakeDriveService(latency=0.2)
+    file_id = drive.put_file("charts", "a.png", b"chart")
+    storage = DriveStorage(drive)
+    results, errors = run_concurrently(10, lambda: storage.read_bytes(file_id))
+    assert not errors
+    assert results == [b"chart"] * 10
+    assert drive.calls["files.get_media"] == 1
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    drive = FakeDriveService(latency=0.2, error_rate=1.0)
+    file_id = drive.put_file("charts", "a.png", b"chart")
+    storage = DriveStorage(drive)
+    results, errors = run_concurrently(5, lambda: storage.read_bytes(file_id))
+    assert not results and len(errors) == 5
+    assert drive.calls["files.get_media"] == 1
+
+    drive.error_rate = 0.0
+    assert storage.read_bytes(file_id) == b"chart"
+
+
+def test_sequential_calls_are_not_coalesced():
+    flights = SingleFlight()
+    calls = []
+    for i in range(3):
+        assert flights.do("key", lambda i=i: calls.append(i) or i) == (i, False)
+    assert calls == [0, 1, 2]
+
+
+def test_leader_exception_is_raised():
+    def fail():
+        raise ValueError("boom")
+
+    flights = SingleFlight()
+    with pytest.raises(ValueError):
+        flights.do("key", fail)
+    assert flights.do("key", lambda: 1) == (1, False)